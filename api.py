@@ -0,0 +1,479 @@
+"""API HTTP/JSON con los mismos agregados que el dashboard, sin Streamlit.
+
+Sirve los cálculos de calculos.py sobre los cubos de los archivos unificados:
+egresos e ingresos por entidad y categoría, utilidad por año, el análisis de
+una entidad, ingresos mensuales, patrones de consumo y la regresión. Los
+cubos se cargan una vez por proceso (desde las columnas compartidas de
+compartido.py si existen) y cada respuesta ya serializada se guarda en una
+caché LRU, así que las consultas repetidas no recalculan ni vuelven a
+serializar nada.
+
+El ETag de cada respuesta depende sólo de la versión de los archivos y de la
+consulta normalizada: con If-None-Match se responde 304 sin calcular. La
+versión (la firma de los archivos, que en un dataset Parquet recorre todos
+sus archivos) se lee a lo más cada --vigencia segundos, o al recibir SIGHUP;
+entre tanto revalidar no toca el disco.
+
+    GET  /api                                  consultas y valores de los filtros
+    GET  /api/egresos?anios=2020,2022&regiones=Centro
+    GET  /api/utilidad?anio=2022
+    POST /api/lote  {"consultas": [{"consulta": "egresos", "anios": [2022]}, ...]}
+
+Uso:
+    python api.py --datos . --puerto 8502
+"""
+import argparse
+import json
+import math
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass, fields, is_dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import calculos
+import trazas
+from carga_datos import firma_fuente
+from cubos import MEDIDAS, ORDEN_INDICE, cargar_cubos, consultar
+from figuras import huella
+from memo import CacheLRU
+
+PUERTO = 8502
+PREFIJO = "/api"
+
+MAX_RESPUESTAS = 4096
+MAX_BYTES_RESPUESTAS = 128 * 2**20
+# Consultas por petición de /api/lote
+MAX_LOTE = 1000
+MAX_BYTES_PETICION = 2**20
+# Segundos que se reutiliza la firma de los archivos antes de volver a leerla
+VIGENCIA_VERSION = 5.0
+
+
+class ErrorConsulta(ValueError):
+    """Consulta mal formada (400) o sin datos (404)."""
+
+    def __init__(self, mensaje, estado=HTTPStatus.BAD_REQUEST):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+# --- Parámetros ---
+# Cada parámetro se normaliza a un valor hashable; las listas quedan ordenadas
+# y sin repetidos para que el orden de la selección no cambie el ETag.
+
+def _texto(valor):
+    if isinstance(valor, bool) or not isinstance(valor, (str, int)):
+        raise ValueError(valor)
+    return str(valor)
+
+
+def _entero(valor):
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ValueError(valor)
+    return int(valor)
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor).lower()
+    if texto in ("1", "true", "si", "sí"):
+        return True
+    if texto in ("0", "false", "no"):
+        return False
+    raise ValueError(valor)
+
+
+def _regresion(valor):
+    por = None if valor in (None, "", "todas") else _texto(valor)
+    if por not in calculos.POR_REGRESION:
+        raise ValueError(valor)
+    return por
+
+
+def _lista(convertir):
+    def normalizar(valor):
+        valores = valor if isinstance(valor, (list, tuple)) else [valor]
+        return tuple(sorted({convertir(v) for v in valores}))
+    normalizar.lista = True
+    return normalizar
+
+
+PARAMETROS = {
+    "regiones": _lista(_texto),
+    "anios": _lista(_entero),
+    "anio": _entero,
+    "entidad": _texto,
+    "categoria": _texto,
+    "por_entidad": _booleano,
+    "por": _regresion,
+}
+
+
+@dataclass
+class Consulta:
+    funcion: object  # calculos.<funcion>(cubos, **parametros)
+    parametros: tuple
+    obligatorios: tuple = ()
+    # Cubos cuyo recorte por los parámetros no puede quedar vacío (ver validar)
+    cubos: tuple = ()
+
+
+CONSULTAS = {
+    "egresos": Consulta(calculos.egresos_por_entidad, ("regiones", "anios"), cubos=("gastos",)),
+    "ingresos": Consulta(calculos.ingresos_por_entidad, ("regiones", "anios"), cubos=("ingresos",)),
+    "egresos_por_categoria": Consulta(
+        calculos.egresos_por_categoria, ("anio", "categoria"), ("anio", "categoria")
+    ),
+    "utilidad": Consulta(calculos.utilidad_por_entidad, ("anio",), ("anio",)),
+    "entidad": Consulta(
+        calculos.analisis_entidad, ("anio", "entidad"), ("anio", "entidad"), cubos=("gastos", "ingresos")
+    ),
+    "gastos_por_descripcion": Consulta(
+        calculos.gastos_por_descripcion, ("anio", "entidad", "categoria"), ("anio", "entidad", "categoria"),
+        cubos=("gastos",),
+    ),
+    "ingresos_mensuales": Consulta(
+        calculos.ingresos_mensuales, ("anio", "entidad"), ("anio", "entidad"), cubos=("ingresos_mensuales",)
+    ),
+    "serie_mensual": Consulta(calculos.serie_ingresos_mensuales, ("regiones", "anios", "por_entidad")),
+    "patrones": Consulta(calculos.patrones, ("anio",), ("anio",), cubos=("gastos",)),
+    "regresion": Consulta(calculos.regresion, ("por",)),
+}
+
+
+def normalizar(nombre, parametros):
+    """(nombre, ((parámetro, valor), ...)) hashable de una consulta; ErrorConsulta si no es válida."""
+    consulta = CONSULTAS.get(nombre)
+    if consulta is None:
+        raise ErrorConsulta(f"Consulta desconocida: {nombre!r}", HTTPStatus.NOT_FOUND)
+    sobrantes = set(parametros) - set(consulta.parametros)
+    if sobrantes:
+        raise ErrorConsulta(f"Parámetros no válidos para {nombre!r}: {', '.join(sorted(sobrantes))}")
+    faltantes = [p for p in consulta.obligatorios if parametros.get(p) is None]
+    if faltantes:
+        raise ErrorConsulta(f"Faltan parámetros para {nombre!r}: {', '.join(faltantes)}")
+
+    normalizados = []
+    for parametro in consulta.parametros:
+        valor = parametros.get(parametro)
+        if valor is None:
+            continue
+        try:
+            normalizados.append((parametro, PARAMETROS[parametro](valor)))
+        except (TypeError, ValueError):
+            raise ErrorConsulta(f"Valor no válido para {parametro!r}: {valor!r}") from None
+    return nombre, tuple(normalizados)
+
+
+def validar(cubos, nombre, parametros):
+    """ErrorConsulta (404) si la consulta pide un año, entidad o categoría sin datos.
+
+    Solo revisa los índices y las sumas memoizadas de los cubos; los errores
+    que aparezcan después al calcular son fallas del servicio, no de la consulta.
+    """
+    consulta = CONSULTAS[nombre]
+    anio, entidad, categoria = (parametros.get(p) for p in ("anio", "entidad", "categoria"))
+    if anio is not None and cubos.utilidad.fila(anio) < 0:
+        raise ErrorConsulta(f"Sin datos del año {anio}", HTTPStatus.NOT_FOUND)
+    if entidad is not None and entidad not in cubos.utilidad.entidades:
+        raise ErrorConsulta(f"Entidad desconocida: {entidad!r}", HTTPStatus.NOT_FOUND)
+    if categoria is not None and categoria not in cubos.gastos["categoria"].cat.categories:
+        raise ErrorConsulta(f"Categoría desconocida: {categoria!r}", HTTPStatus.NOT_FOUND)
+
+    for cubo in consulta.cubos:
+        if "regiones" in consulta.parametros:
+            vacio = consultar(
+                cubos, cubo, "nombreEntidad2", MEDIDAS[cubo], parametros.get("regiones"), parametros.get("anios")
+            ).empty
+        else:
+            clave = tuple(v for v in (anio, entidad, categoria) if v is not None)
+            vacio = clave not in cubos.indices[(cubo, tuple(ORDEN_INDICE[:len(clave)]))]
+        if vacio:
+            raise ErrorConsulta("Sin datos para la consulta", HTTPStatus.NOT_FOUND)
+
+
+def parametros_url(consulta):
+    """Parámetros de una query string; las listas aceptan comas o claves repetidas."""
+    parametros = {}
+    for clave, valores in parse_qs(consulta, keep_blank_values=True).items():
+        if getattr(PARAMETROS.get(clave), "lista", False):
+            parametros[clave] = [v for valor in valores for v in valor.split(",") if v]
+        else:
+            parametros[clave] = valores[-1]
+    return parametros
+
+
+# --- Serialización ---
+
+def a_json(valor):
+    """Resultados de calculos (dataclasses, DataFrames, escalares de numpy) como tipos de JSON."""
+    if is_dataclass(valor) and not isinstance(valor, type):
+        return {c.name: a_json(getattr(valor, c.name)) for c in fields(valor)}
+    if isinstance(valor, pd.DataFrame):
+        return [{str(k): a_json(v) for k, v in fila.items()} for fila in valor.to_dict(orient="records")]
+    if isinstance(valor, pd.Series):
+        return {str(k): a_json(v) for k, v in valor.items()}
+    if isinstance(valor, dict):
+        return {str(k): a_json(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple, pd.Index, np.ndarray)):
+        return [a_json(v) for v in valor]
+    if valor is None or valor is pd.NA or valor is pd.NaT:
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def serializar(valor):
+    return json.dumps(a_json(valor), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# --- Servicio ---
+
+@dataclass
+class Respuesta:
+    etag: str
+    cuerpo: bytes
+
+
+class Servicio:
+    """Consultas sobre los cubos de `directorio` con caché de respuestas serializadas."""
+
+    def __init__(self, directorio=".", ruta_gastos="gastosUnificados.csv", ruta_ingresos="ingresosUnificados.csv",
+                 vigencia=VIGENCIA_VERSION):
+        self.rutas = (os.path.join(directorio, ruta_gastos), os.path.join(directorio, ruta_ingresos))
+        self.respuestas = CacheLRU(max_entradas=MAX_RESPUESTAS, max_bytes=MAX_BYTES_RESPUESTAS)
+        self.vigencia = vigencia
+        # (versión, momento en que se leyó) y (versión, cubos) vigentes
+        self._version = None
+        self._cubos = None
+        self._lock_version = threading.Lock()
+        self._lock_cubos = threading.Lock()
+
+    def version(self):
+        """Firma de los archivos de datos; cambia el ETag de todo cuando cambian.
+
+        Se vuelve a leer del disco solo cuando tiene más de `vigencia` segundos
+        (o después de `recargar`); mientras tanto cuesta una comparación.
+        """
+        actual = self._version
+        if actual is not None and time.monotonic() - actual[1] < self.vigencia:
+            return actual[0]
+        with self._lock_version:
+            actual = self._version
+            if actual is None or time.monotonic() - actual[1] >= self.vigencia:
+                actual = self._version = (tuple(firma_fuente(ruta) for ruta in self.rutas), time.monotonic())
+        return actual[0]
+
+    def recargar(self):
+        """Descarta la firma guardada: la siguiente petición vuelve a leer los archivos."""
+        self._version = None
+
+    def cubos(self):
+        """Cubos de la versión actual; peticiones simultáneas esperan una sola carga."""
+        version = self.version()
+        actuales = self._cubos
+        if actuales is not None and actuales[0] == version:
+            return actuales[1]
+        with self._lock_cubos:
+            actuales = self._cubos
+            if actuales is None or actuales[0] != version:
+                actuales = self._cubos = (version, cargar_cubos(*self.rutas))
+        return actuales[1]
+
+    def etag(self, consulta):
+        """ETag de una consulta normalizada; no calcula nada."""
+        return f'"{huella(self.version(), consulta)}"'
+
+    def responder(self, consulta, etag=None):
+        """Respuesta de una consulta normalizada, de la caché si ya se calculó."""
+        etag = etag or self.etag(consulta)
+        nombre, parametros = consulta
+
+        def calcular():
+            cubos = self.cubos()
+            validar(cubos, nombre, dict(parametros))
+            return serializar(CONSULTAS[nombre].funcion(cubos, **dict(parametros)))
+
+        return Respuesta(etag, self.respuestas.obtener_o_calcular(etag, calcular))
+
+    def indice(self):
+        """Consultas disponibles y valores posibles de los filtros."""
+        cubos = self.cubos()
+        return {
+            "consultas": {
+                nombre: {"parametros": list(c.parametros), "obligatorios": list(c.obligatorios)}
+                for nombre, c in CONSULTAS.items()
+            },
+            "anios": sorted(int(a) for a in cubos.gastos["anio"].unique()),
+            "regiones": sorted(str(r) for r in cubos.gastos["region"].unique()),
+            "entidades": [str(e) for e in cubos.utilidad.entidades],
+            "categorias": sorted(str(c) for c in cubos.gastos["categoria"].unique()),
+        }
+
+    def lote(self, consultas):
+        """Respuesta de varias consultas; las inválidas llevan su error en lugar del resultado."""
+        if not isinstance(consultas, list) or not all(isinstance(c, dict) for c in consultas):
+            raise ErrorConsulta('Se espera {"consultas": [{"consulta": ..., <parámetros>}, ...]}')
+        if len(consultas) > MAX_LOTE:
+            raise ErrorConsulta(f"Un lote admite hasta {MAX_LOTE} consultas")
+
+        partes, etags = [], []
+        for pedida in consultas:
+            parametros = dict(pedida)
+            nombre = parametros.pop("consulta", None)
+            encabezado = serializar({"consulta": nombre})[:-1]
+            try:
+                respuesta = self.responder(normalizar(nombre, parametros))
+            except ErrorConsulta as error:
+                etags.append(str(error))
+                partes.append(encabezado + b',"error":' + serializar(str(error)) + b"}")
+                continue
+            etags.append(respuesta.etag)
+            partes.append(
+                encabezado + b',"etag":' + serializar(respuesta.etag) + b',"resultado":' + respuesta.cuerpo + b"}"
+            )
+        return Respuesta(f'"{huella(etags)}"', b'{"resultados":[' + b",".join(partes) + b"]}")
+
+
+# --- HTTP ---
+
+def coincide(if_none_match, etag):
+    """True si el encabezado If-None-Match incluye `etag` (comparación débil)."""
+    if not if_none_match:
+        return False
+    candidatos = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidatos or etag in [c.removeprefix("W/") for c in candidatos]
+
+
+class Manejador(BaseHTTPRequestHandler):
+    server_version = "EnighAPI/1.0"
+    # Conexiones persistentes: los clientes de alto volumen no reabren sockets
+    protocol_version = "HTTP/1.1"
+    # Encabezados y cuerpo se escriben por separado; sin esto Nagle y el ACK
+    # retrasado agregan ~40 ms a cada respuesta en una conexión persistente
+    disable_nagle_algorithm = True
+
+    @property
+    def servicio(self):
+        return self.server.servicio
+
+    def do_GET(self):
+        self._atender(self._get)
+
+    def do_HEAD(self):
+        self._atender(self._get, cuerpo=False)
+
+    def do_POST(self):
+        self._atender(self._post)
+
+    def _get(self):
+        url = urlsplit(self.path)
+        ruta = url.path.rstrip("/")
+        if ruta == PREFIJO:
+            etag = f'"{huella(self.servicio.version())}"'
+            if coincide(self.headers.get("If-None-Match"), etag):
+                return Respuesta(etag, None)
+            return Respuesta(etag, serializar(self.servicio.indice()))
+        if not ruta.startswith(PREFIJO + "/"):
+            raise ErrorConsulta(f"Ruta desconocida: {url.path}", HTTPStatus.NOT_FOUND)
+
+        consulta = normalizar(ruta[len(PREFIJO) + 1:], parametros_url(url.query))
+        etag = self.servicio.etag(consulta)
+        if coincide(self.headers.get("If-None-Match"), etag):
+            return Respuesta(etag, None)
+        return self.servicio.responder(consulta, etag)
+
+    def _post(self):
+        if urlsplit(self.path).path.rstrip("/") != PREFIJO + "/lote":
+            raise ErrorConsulta(f"Ruta desconocida: {self.path}", HTTPStatus.NOT_FOUND)
+        longitud = int(self.headers.get("Content-Length") or 0)
+        if longitud > MAX_BYTES_PETICION:
+            raise ErrorConsulta("Petición demasiado grande", HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        try:
+            pedido = json.loads(self.rfile.read(longitud) or b"{}")
+        except ValueError:
+            raise ErrorConsulta("El cuerpo no es JSON válido") from None
+        respuesta = self.servicio.lote(pedido.get("consultas") if isinstance(pedido, dict) else None)
+        # Un lote es una lectura: se acepta la revalidación igual que en GET
+        if coincide(self.headers.get("If-None-Match"), respuesta.etag):
+            return Respuesta(respuesta.etag, None)
+        return respuesta
+
+    def _atender(self, atender, cuerpo=True):
+        with trazas.traza("api", etiqueta=f"{self.command} {self.path}"):
+            try:
+                respuesta = atender()
+            except ErrorConsulta as error:
+                self._enviar(error.estado, serializar({"error": str(error)}), cuerpo=cuerpo)
+                return
+            except Exception:
+                self._enviar(HTTPStatus.INTERNAL_SERVER_ERROR, serializar({"error": "Error interno"}), cuerpo=cuerpo)
+                raise
+            if respuesta.cuerpo is None:
+                self._enviar(HTTPStatus.NOT_MODIFIED, None, respuesta.etag)
+            else:
+                self._enviar(HTTPStatus.OK, respuesta.cuerpo, respuesta.etag, cuerpo)
+
+    def _enviar(self, estado, datos, etag=None, cuerpo=True):
+        self.send_response(estado)
+        if etag:
+            self.send_header("ETag", etag)
+            # Los clientes pueden guardar la respuesta, pero deben revalidarla
+            self.send_header("Cache-Control", "no-cache")
+        if datos is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos) if datos is not None else 0))
+        self.end_headers()
+        if cuerpo and datos is not None:
+            self.wfile.write(datos)
+
+
+def servir(directorio=".", host="127.0.0.1", puerto=PUERTO, vigencia=VIGENCIA_VERSION):
+    """Servidor HTTP (un hilo por conexión) de los agregados de `directorio`."""
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    servidor.servicio = Servicio(directorio, vigencia=vigencia)
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API JSON con los agregados del dashboard")
+    parser.add_argument("--datos", default=".", help="directorio de los archivos unificados")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--trazas", help="archivo JSON por líneas para las trazas de cada petición")
+    parser.add_argument("--precalentar", action="store_true",
+                        help="carga los cubos antes de aceptar peticiones")
+    parser.add_argument("--vigencia", type=float, default=VIGENCIA_VERSION,
+                        help="segundos entre revisiones de los archivos de datos (SIGHUP fuerza una)")
+    args = parser.parse_args(argv)
+
+    trazas.configurar(args.trazas)
+    servidor = servir(args.datos, args.host, args.puerto, args.vigencia)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: servidor.servicio.recargar())
+    if args.precalentar:
+        servidor.servicio.cubos()
+    print(f"Sirviendo en http://{args.host}:{servidor.server_port}{PREFIJO}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
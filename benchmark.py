@@ -0,0 +1,375 @@
+"""Pruebas de rendimiento del dashboard y del ETL, sin Streamlit.
+
+Genera datos sintéticos con la forma de la ENIGH (sinteticos.py) para cada
+tamaño pedido, mide cada cálculo del dashboard (carga, cubos, filtros, cada
+panel, utilidad, patrones, regresión, mapas) y, con --etl, cada etapa del
+ETL. Con --importacion reporta el tiempo de importación del arranque del
+dashboard. Los resultados se guardan en JSON para compararlos entre versiones.
+
+Uso:
+    python benchmark.py --filas 100000 1000000 --salida resultados.json
+    python benchmark.py --filas 1000000 --etl --comparar anterior.json
+    python benchmark.py --importacion
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import calculos
+import etl
+import sinteticos
+from carga_datos import (
+    COLUMNAS_GASTOS,
+    COLUMNAS_INGRESOS,
+    cargar_gastos,
+    cargar_ingresos,
+    leer_csv,
+    limpiar_cache,
+)
+from cubos import construir_cubos, entidades, filtrar
+from geo import cargar_coordenadas
+from hechos import TablaHechos
+
+REPETICIONES = 5
+
+# Variación relativa a partir de la cual --comparar marca una regresión
+UMBRAL_REGRESION = 0.2
+
+
+def medir(funcion, repeticiones=REPETICIONES, preparar=None):
+    """Tiempos de `repeticiones` llamadas a `funcion`; `preparar` corre antes de cada una sin medirse."""
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        "mediana_s": statistics.median(tiempos),
+        "min_s": min(tiempos),
+        "max_s": max(tiempos),
+        "tiempos_s": tiempos,
+    }
+
+
+def memoria_maxima():
+    """Memoria residente máxima del proceso en bytes."""
+    maxima = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxima if sys.platform == "darwin" else maxima * 1024
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def preparar_datos(directorio, filas, csv=False, regenerar=False):
+    """Datos sintéticos de `filas` filas en `directorio`/<filas>; se reutilizan si ya existen."""
+    destino = os.path.join(directorio, str(filas))
+    listos = all(
+        os.path.isdir(os.path.join(destino, f"{nombre}Unificados.parquet"))
+        and (not csv or os.path.exists(os.path.join(destino, f"{nombre}Unificados.csv")))
+        for nombre in ["gastos", "ingresos"]
+    )
+    if regenerar or not listos:
+        sinteticos.escribir_unificados(destino, filas, csv=csv)
+    return destino
+
+
+def medir_dashboard(directorio, repeticiones=REPETICIONES, csv=False):
+    """Tiempos de cada etapa del dashboard sobre los datos de `directorio`."""
+    ruta_gastos = os.path.join(directorio, "gastosUnificados.csv")
+    ruta_ingresos = os.path.join(directorio, "ingresosUnificados.csv")
+    etapas = {}
+
+    def cargar():
+        cargar_gastos(ruta_gastos, columnas=COLUMNAS_GASTOS)
+        cargar_ingresos(ruta_ingresos, columnas=COLUMNAS_INGRESOS)
+
+    etapas["carga"] = medir(cargar, repeticiones, preparar=limpiar_cache)
+    etapas["carga_en_cache"] = medir(cargar, repeticiones)
+    df_gastos = cargar_gastos(ruta_gastos, columnas=COLUMNAS_GASTOS)
+    df_ingresos = cargar_ingresos(ruta_ingresos, columnas=COLUMNAS_INGRESOS)
+    if csv:
+        def cargar_csv():
+            leer_csv(ruta_gastos, "gasto_tri", COLUMNAS_GASTOS)
+            leer_csv(ruta_ingresos, "ing_tri", COLUMNAS_INGRESOS)
+
+        etapas["carga_csv"] = medir(cargar_csv, repeticiones)
+
+    etapas["cubos"] = medir(lambda: construir_cubos(df_gastos, df_ingresos), repeticiones)
+    hechos_gastos = TablaHechos.desde_dataframe(df_gastos)
+    hechos_ingresos = TablaHechos.desde_dataframe(df_ingresos)
+    etapas["cubos_hechos"] = medir(lambda: construir_cubos(hechos_gastos, hechos_ingresos), repeticiones)
+    cubos = construir_cubos(hechos_gastos, hechos_ingresos)
+
+    regiones = list(cubos.gastos["region"].unique())[:-1]
+    anios = sorted(int(a) for a in cubos.gastos["anio"].unique())
+    filtros = {"regiones": regiones, "anios": anios}
+    anio = anios[-1]
+    entidad = entidades(cubos, anio)[0]
+    coordenadas = cargar_coordenadas(os.path.join(directorio, "mexico.json"))
+
+    etapas["filtro_crudo"] = medir(
+        lambda: df_gastos[df_gastos["region"].isin(regiones) & df_gastos["anio"].isin(anios)],
+        repeticiones,
+    )
+    etapas["filtro_cubo"] = medir(lambda: filtrar(cubos.gastos, regiones, anios), repeticiones)
+
+    # Los paneles se miden sin la caché de consultas (memo) y, aparte, servidos de ella
+    analisis = calculos.analisis_entidad(cubos, anio, entidad)
+    categoria = analisis.categoria_egresos
+    paneles = {
+        "egresos_por_entidad": lambda: calculos.egresos_por_entidad(cubos, **filtros),
+        "ingresos_por_entidad": lambda: calculos.ingresos_por_entidad(cubos, **filtros),
+        "utilidad": lambda: calculos.utilidad_por_entidad(cubos, anio),
+        "analisis_entidad": lambda: calculos.analisis_entidad(cubos, anio, entidad),
+        "gastos_por_descripcion": lambda: calculos.gastos_por_descripcion(cubos, anio, entidad, categoria),
+        "egresos_por_categoria": lambda: calculos.egresos_por_categoria(cubos, anio, categoria),
+        "ingresos_mensuales": lambda: calculos.ingresos_mensuales(cubos, anio, entidad),
+        "patrones": lambda: calculos.patrones(cubos, anio),
+        "regresion": lambda: calculos.regresion(cubos),
+        "regresion_por_anio": lambda: calculos.regresion(cubos, "anio"),
+        "regresion_por_region": lambda: calculos.regresion(cubos, "region"),
+        "mapas": lambda: calculos.mapas(cubos, coordenadas),
+        "mapas_filtrados": lambda: calculos.mapas(cubos, coordenadas, **filtros),
+    }
+    for nombre, panel in paneles.items():
+        etapas[nombre] = medir(panel, repeticiones, preparar=cubos.memo.limpiar)
+    etapas["paneles_en_cache"] = medir(
+        lambda: [panel() for panel in paneles.values()], repeticiones
+    )
+
+    memoria = {
+        "gastos_bytes": int(df_gastos.memory_usage(deep=True).sum()),
+        "ingresos_bytes": int(df_ingresos.memory_usage(deep=True).sum()),
+        "hechos_gastos_bytes": hechos_gastos.memoria(),
+        "hechos_ingresos_bytes": hechos_ingresos.memoria(),
+        "cubos_bytes": int(sum(
+            getattr(cubos, c).memory_usage(deep=True).sum()
+            for c in ["gastos", "ingresos", "lugar_comp", "forma_pago", "ingresos_mensuales"]
+        )),
+    }
+    return {
+        "filas_gastos": len(df_gastos),
+        "filas_ingresos": len(df_ingresos),
+        "memoria": memoria,
+        "etapas": etapas,
+    }
+
+
+def medir_etl(directorio, filas, repeticiones=1, tamanio_bloque=etl.TAMANIO_BLOQUE):
+    """Tiempos de las etapas del ETL sobre archivos crudos sintéticos.
+
+    `filas` es el total de filas de gastos, repartido entre los años.
+    """
+    crudos = os.path.join(directorio, str(filas), "crudos")
+    salida = os.path.join(directorio, str(filas), "etl")
+    por_anio = max(1, filas // len(etl.ANIOS))
+    if not os.path.exists(os.path.join(crudos, f"gastos{etl.ANIOS[-1]}.csv")):
+        sinteticos.escribir_crudos(crudos, por_anio)
+    os.makedirs(salida, exist_ok=True)
+
+    etapas = {}
+    for nombre, conjunto in etl.CONJUNTOS.items():
+        ruta = os.path.join(crudos, f"{nombre}{etl.ANIOS[-1]}.csv")
+        bloque = next(pd.read_csv(ruta, chunksize=tamanio_bloque, dtype=str))
+        poblacion, categorias = etl.leer_dimensiones(conjunto, crudos)
+        etapas[f"{nombre}:lectura_bloque"] = medir(
+            lambda: next(pd.read_csv(ruta, chunksize=tamanio_bloque, dtype=str)), repeticiones
+        )
+        etapas[f"{nombre}:dimensiones"] = medir(
+            lambda: etl.leer_dimensiones(conjunto, crudos), repeticiones
+        )
+        etapas[f"{nombre}:transformar_bloque"] = medir(
+            lambda: etl.transformar(bloque.copy(), conjunto, etl.ANIOS[-1]), repeticiones
+        )
+        transformado = etl.transformar(bloque.copy(), conjunto, etl.ANIOS[-1])
+        etapas[f"{nombre}:unir_dimensiones"] = medir(
+            lambda: categorias.unir(poblacion.unir(transformado)),
+            repeticiones,
+        )
+        for anio in etl.ANIOS:
+            etapas[f"{nombre}:parte_{anio}"] = medir(
+                lambda: etl.procesar_parte(nombre, anio, crudos, salida, tamanio_bloque), repeticiones
+            )
+        partes = [etl.ruta_parte(conjunto, anio, salida) for anio in etl.ANIOS]
+        etapas[f"{nombre}:unir_partes"] = medir(
+            lambda: etl.unir_partes(partes, os.path.join(salida, conjunto.salida)), repeticiones
+        )
+
+    etapas["construir_completo"] = medir(
+        lambda: etl.construir(directorio_datos=crudos, directorio_salida=salida,
+                              tamanio_bloque=tamanio_bloque, completo=True),
+        repeticiones,
+    )
+    etapas["construir_sin_cambios"] = medir(
+        lambda: etl.construir(directorio_datos=crudos, directorio_salida=salida,
+                              tamanio_bloque=tamanio_bloque),
+        repeticiones,
+    )
+    return {"filas_por_anio": por_anio, "etapas": etapas}
+
+
+# Módulos que importa el dashboard al arrancar y los que difiere hasta usarlos
+MODULOS_ARRANQUE = ["streamlit", "calculos", "carga_datos", "cubos", "perezoso"]
+MODULOS_DIFERIDOS = ["plotly.express", "pyarrow.parquet"]
+# No deben cargarse al arrancar
+MODULOS_PESADOS = ["matplotlib", "sklearn", "statsmodels", "scipy"]
+
+
+def tiempos_importacion(codigo):
+    """Corre `codigo` con -X importtime en un proceso nuevo.
+
+    Regresa ({módulo: (propio_s, acumulado_s)}, salida estándar).
+    """
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo], capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+    )
+    tiempos = {}
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith("import time:") or linea.count("|") != 2:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        if not propio.strip().isdigit():
+            continue  # encabezado
+        tiempos[nombre.strip()] = (int(propio) / 1e6, int(acumulado) / 1e6)
+    return tiempos, salida.stdout
+
+
+def perfil_importacion(principales=15):
+    """Costo de importación del arranque del dashboard y de cada módulo diferido.
+
+    Cada medición corre en un proceso nuevo. Los módulos diferidos se miden
+    después de importar los de arranque, así sólo cuentan lo que agregan.
+    """
+    arranque = "import " + ", ".join(MODULOS_ARRANQUE)
+    tiempos, cargados = tiempos_importacion(
+        f"{arranque}; import sys; print(' '.join(m for m in {MODULOS_PESADOS!r} if m in sys.modules))"
+    )
+    # Paquetes de primer nivel con mayor tiempo acumulado
+    paquetes = sorted(
+        ((nombre, acumulado) for nombre, (_, acumulado) in tiempos.items() if "." not in nombre),
+        key=lambda t: t[1], reverse=True,
+    )
+    perfil = {
+        "arranque_s": sum(tiempos.get(m, (0.0, 0.0))[1] for m in MODULOS_ARRANQUE),
+        "principales": dict(paquetes[:principales]),
+        "pesados_cargados": cargados.split(),
+        "diferidos": {},
+    }
+    for modulo in MODULOS_DIFERIDOS:
+        tiempos, _ = tiempos_importacion(f"{arranque}; import {modulo}")
+        perfil["diferidos"][modulo] = tiempos.get(modulo, (0.0, 0.0))[1]
+    return perfil
+
+
+def comparar(actual, anterior, umbral=UMBRAL_REGRESION):
+    """Etapas cuya mediana creció más de `umbral` respecto a `anterior`.
+
+    Regresa una lista de (filas, seccion, etapa, mediana anterior, mediana actual).
+    """
+    previos = {r["filas"]: r for r in anterior["resultados"]}
+    regresiones = []
+    for resultado in actual["resultados"]:
+        previo = previos.get(resultado["filas"])
+        if previo is None:
+            continue
+        for seccion in ["dashboard", "etl"]:
+            if seccion not in resultado or seccion not in previo:
+                continue
+            for etapa, medida in resultado[seccion]["etapas"].items():
+                antes = previo[seccion]["etapas"].get(etapa)
+                if antes and medida["mediana_s"] > antes["mediana_s"] * (1 + umbral):
+                    regresiones.append(
+                        (resultado["filas"], seccion, etapa, antes["mediana_s"], medida["mediana_s"])
+                    )
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento del dashboard y del ETL")
+    parser.add_argument("--filas", type=int, nargs="+",
+                        help="filas de gastos de cada corrida (ingresos lleva la mitad); "
+                             "por defecto 100000 y 1000000, o ninguna con --importacion")
+    parser.add_argument("--directorio", default="sinteticos",
+                        help="directorio de los datos sintéticos (se reutilizan entre corridas)")
+    parser.add_argument("--salida", default="benchmark.json")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--csv", action="store_true", help="mide también la carga desde CSV")
+    parser.add_argument("--etl", action="store_true", help="mide también las etapas del ETL")
+    parser.add_argument("--regenerar", action="store_true", help="vuelve a generar los datos")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION)
+    parser.add_argument("--importacion", action="store_true",
+                        help="mide el tiempo de importación del arranque del dashboard")
+    args = parser.parse_args(argv)
+    if args.filas is None:
+        args.filas = [] if args.importacion else [100_000, 1_000_000]
+
+    informe = {
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit_actual(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeticiones": args.repeticiones,
+        "resultados": [],
+    }
+    if args.importacion:
+        perfil = perfil_importacion()
+        informe["importacion"] = perfil
+        print(f"importación del arranque: {perfil['arranque_s'] * 1000:.0f} ms")
+        for nombre, segundos in perfil["principales"].items():
+            print(f"  {nombre:<30} {segundos * 1000:8.1f} ms")
+        for nombre, segundos in perfil["diferidos"].items():
+            print(f"  diferido {nombre:<21} {segundos * 1000:8.1f} ms")
+        if perfil["pesados_cargados"]:
+            print(f"  AVISO: se cargan al arrancar: {', '.join(perfil['pesados_cargados'])}")
+    for filas in args.filas:
+        print(f"--- {filas} filas ---")
+        directorio = preparar_datos(args.directorio, filas, args.csv, args.regenerar)
+        resultado = {"filas": filas, "dashboard": medir_dashboard(directorio, args.repeticiones, args.csv)}
+        if args.etl:
+            resultado["etl"] = medir_etl(args.directorio, filas)
+        resultado["memoria_maxima_bytes"] = memoria_maxima()
+        informe["resultados"].append(resultado)
+        for seccion in ["dashboard", "etl"]:
+            for etapa, medida in resultado.get(seccion, {}).get("etapas", {}).items():
+                print(f"{seccion}:{etapa:<32} {medida['mediana_s'] * 1000:10.2f} ms")
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=1, ensure_ascii=False)
+    print(f"Resultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        regresiones = comparar(informe, anterior, args.umbral)
+        for filas, seccion, etapa, antes, ahora in regresiones:
+            print(f"REGRESIÓN {filas} filas {seccion}:{etapa}: {antes * 1000:.2f} ms -> {ahora * 1000:.2f} ms")
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
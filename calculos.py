@@ -0,0 +1,377 @@
+"""Cálculos del dashboard que no dependen de Streamlit."""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from cubos import consultar, normalizar_filtros, rebanar, sumar
+from regresion import ajustar
+
+
+def patrones_consumo(df, medida="gasto_tri", entidad="nombreEntidad2", categoria="categoria"):
+    """Categoría de mayor y menor gasto de cada entidad.
+
+    Se agrupa una sola vez por (entidad, categoría) y sobre esas sumas se
+    obtienen los máximos y mínimos de todas las entidades a la vez, así que el
+    costo es lineal en el número de filas de `df` (datos crudos o un cubo).
+
+    Regresa una fila por entidad con las columnas Entidad, Categoría Mayor,
+    Total Mayor, Porcentaje Mayor, Categoría Menor, Total Menor,
+    Porcentaje Menor y Total.
+    """
+    totales = df.groupby([entidad, categoria], observed=True)[medida].sum().reset_index()
+    por_entidad = totales.groupby(entidad, observed=True)[medida]
+    totales["total"] = por_entidad.transform("sum")
+    totales["porcentaje"] = totales[medida] / totales["total"] * 100
+
+    mayor = totales.loc[por_entidad.idxmax()].reset_index(drop=True)
+    menor = totales.loc[por_entidad.idxmin()].reset_index(drop=True)
+    return pd.DataFrame({
+        "Entidad": mayor[entidad],
+        "Categoría Mayor": mayor[categoria],
+        "Total Mayor": mayor[medida],
+        "Porcentaje Mayor": mayor["porcentaje"],
+        "Categoría Menor": menor[categoria],
+        "Total Menor": menor[medida],
+        "Porcentaje Menor": menor["porcentaje"],
+        "Total": mayor["total"],
+    })
+
+
+def categorias_mas_repetidas(patrones):
+    """(categoría mayor más frecuente, categoría menor más frecuente)."""
+    return (
+        patrones["Categoría Mayor"].mode()[0],
+        patrones["Categoría Menor"].mode()[0],
+    )
+
+
+# --- Paneles del dashboard ---
+# Cada función recibe los cubos y el estado de los filtros y regresa datos
+# planos (DataFrames, números y dataclasses); la capa de Streamlit solo dibuja.
+
+@dataclass
+class ExtremoEntidad:
+    """Entidad con el total mayor o menor y su desglose por categoría."""
+    entidad: str
+    total: float
+    desglose: pd.DataFrame  # categoría -> medida, porcentaje
+    categoria_mayor: str
+    porcentaje_mayor: float
+    categoria_menor: str
+    porcentaje_menor: float
+
+
+@dataclass
+class PanelTotales:
+    """Totales por entidad (egresos o ingresos) y las entidades extremas."""
+    detalle: pd.DataFrame  # entidad, categoría -> medida (barras apiladas)
+    totales: pd.DataFrame  # entidad -> medida
+    mayor: ExtremoEntidad
+    menor: ExtremoEntidad
+
+
+@dataclass
+class Utilidad:
+    """Ingresos, egresos y utilidad de cada entidad en un año."""
+    por_entidad: pd.DataFrame  # nombreEntidad2, ingresos, egresos, utilidad
+    mayor: pd.Series
+    menor: pd.Series
+
+
+@dataclass
+class AnalisisEntidad:
+    """Desgloses de una entidad en un año (drill-down)."""
+    gastos_por_categoria: pd.DataFrame
+    ingresos_por_descripcion: pd.DataFrame
+    gastos_por_lugar: pd.DataFrame
+    gastos_por_forma_pago: pd.DataFrame
+    total_ingresos: float
+    total_egresos: float
+    utilidad: float
+    categoria_egresos: str
+    porcentaje_egresos: float
+    categoria_ingresos: str
+    porcentaje_ingresos: float
+
+
+@dataclass
+class Patrones:
+    tabla: pd.DataFrame  # salida de patrones_consumo
+    categoria_mayor: str  # la más repetida como mayor gasto
+    categoria_menor: str  # la más repetida como menor gasto
+
+
+@dataclass
+class Regresion:
+    """Egreso total contra ingreso total; un ajuste por grupo de `por`."""
+    datos: pd.DataFrame  # Entidad, Ingreso total, Egreso total[, por]
+    ajustes: pd.DataFrame  # [por,] n, intercepto, pendiente, r2, r2_cv, mse_cv, pendiente_inf/sup
+    por: str  # None, "anio" o "region"
+    r2: float  # fuera de muestra (validación cruzada), de todos los grupos
+    mse: float
+
+
+@dataclass
+class Mapas:
+    gastos: pd.DataFrame  # Estado, Latitud, Longitud, Gasto Total
+    ingresos: pd.DataFrame  # Estado, Latitud, Longitud, Ingreso Total
+
+
+def _principal(desglose, columna, medida):
+    """(valor de `columna` con la mayor `medida`, su porcentaje del total)."""
+    fila = desglose.loc[desglose[medida].idxmax()]
+    return fila[columna], float(fila[medida] / desglose[medida].sum() * 100)
+
+
+def _extremo(cubos, cubo, categoria, medida, fila, filtros):
+    desglose = consultar(cubos, cubo, categoria, medida, entidad=fila["nombreEntidad2"], **filtros)
+    desglose = desglose.assign(porcentaje=desglose[medida] / desglose[medida].sum() * 100)
+    mayor = desglose.loc[desglose[medida].idxmax()]
+    menor = desglose.loc[desglose[medida].idxmin()]
+    return ExtremoEntidad(
+        entidad=fila["nombreEntidad2"],
+        total=float(fila[medida]),
+        desglose=desglose,
+        categoria_mayor=mayor[categoria],
+        porcentaje_mayor=float(mayor["porcentaje"]),
+        categoria_menor=menor[categoria],
+        porcentaje_menor=float(menor["porcentaje"]),
+    )
+
+
+def _panel_totales(cubos, cubo, categoria, medida, regiones, anios):
+    filtros = {"regiones": regiones, "anios": anios}
+    totales = consultar(cubos, cubo, "nombreEntidad2", medida, **filtros)
+    return PanelTotales(
+        detalle=consultar(cubos, cubo, ["nombreEntidad2", categoria], medida, **filtros),
+        totales=totales,
+        mayor=_extremo(cubos, cubo, categoria, medida, totales.loc[totales[medida].idxmax()], filtros),
+        menor=_extremo(cubos, cubo, categoria, medida, totales.loc[totales[medida].idxmin()], filtros),
+    )
+
+
+def egresos_por_entidad(cubos, regiones=None, anios=None):
+    return _panel_totales(cubos, "gastos", "categoria", "gasto_tri", regiones, anios)
+
+
+def ingresos_por_entidad(cubos, regiones=None, anios=None):
+    return _panel_totales(cubos, "ingresos", "descripcion", "ing_tri", regiones, anios)
+
+
+def utilidad_por_entidad(cubos, anio):
+    """Ingresos menos egresos por entidad en `anio` (sin entidades incompletas).
+
+    Se lee de la fila de `anio` en la matriz de utilidad de los cubos.
+    """
+    matriz = cubos.utilidad
+    fila = matriz.fila(anio)
+    # Un año sin datos (fila -1) deja la máscara vacía
+    completa = matriz.completa[fila] & (fila >= 0)
+    por_entidad = pd.DataFrame({
+        "nombreEntidad2": matriz.entidades[completa],
+        "ingresos": matriz.ingresos[fila, completa],
+        "egresos": matriz.egresos[fila, completa],
+        "utilidad": matriz.utilidad[fila, completa],
+    })
+    return Utilidad(
+        por_entidad=por_entidad,
+        mayor=por_entidad.loc[por_entidad["utilidad"].idxmax()],
+        menor=por_entidad.loc[por_entidad["utilidad"].idxmin()],
+    )
+
+
+def analisis_entidad(cubos, anio, entidad):
+    gastos_por_categoria = sumar(rebanar(cubos, "gastos", anio, entidad), "categoria", "gasto_tri")
+    ingresos_por_descripcion = sumar(rebanar(cubos, "ingresos", anio, entidad), "descripcion", "ing_tri")
+    total_ingresos, total_egresos, utilidad = cubos.utilidad.celda(anio, entidad)
+    categoria_egresos, porcentaje_egresos = _principal(gastos_por_categoria, "categoria", "gasto_tri")
+    categoria_ingresos, porcentaje_ingresos = _principal(ingresos_por_descripcion, "descripcion", "ing_tri")
+    return AnalisisEntidad(
+        gastos_por_categoria=gastos_por_categoria,
+        ingresos_por_descripcion=ingresos_por_descripcion,
+        gastos_por_lugar=sumar(rebanar(cubos, "lugar_comp", anio, entidad), "lugar_comp", "gasto_tri"),
+        gastos_por_forma_pago=sumar(rebanar(cubos, "forma_pago", anio, entidad), "forma_pag1", "gasto_tri"),
+        total_ingresos=total_ingresos,
+        total_egresos=total_egresos,
+        utilidad=utilidad,
+        categoria_egresos=categoria_egresos,
+        porcentaje_egresos=porcentaje_egresos,
+        categoria_ingresos=categoria_ingresos,
+        porcentaje_ingresos=porcentaje_ingresos,
+    )
+
+
+def gastos_por_descripcion(cubos, anio, entidad, categoria):
+    """Gasto por descripción dentro de una categoría (treemap)."""
+    return sumar(rebanar(cubos, "gastos", anio, entidad, categoria), "descripcion", "gasto_tri")
+
+
+def egresos_por_categoria(cubos, anio, categoria):
+    """Gasto de cada entidad en una categoría y año."""
+    return consultar(cubos, "gastos", "nombreEntidad2", "gasto_tri", anios=[anio], categoria=categoria)
+
+
+def ingresos_mensuales(cubos, anio, entidad):
+    """Total de ingresos por mes calendario de una entidad en un año."""
+    mensual = rebanar(cubos, "ingresos_mensuales", anio, entidad)
+    return pd.DataFrame({
+        "Mes": mensual["mes"].astype(str).to_numpy(),
+        "Total Ingresos": mensual["ingreso"].to_numpy(),
+    })
+
+
+def serie_ingresos_mensuales(cubos, regiones=None, anios=None, por_entidad=False):
+    """Serie mensual de ingresos de todos los años y entidades filtrados.
+
+    Regresa Periodo (primer día del mes), Total Ingresos y, con
+    `por_entidad`, la columna Entidad. Con cubos por habitante la serie sin
+    `por_entidad` es el promedio de las entidades ponderado por su población.
+    """
+    por_habitante = cubos.poblacion is not None
+    por = ["anio", "mes"] + (["nombreEntidad2"] if por_entidad or por_habitante else [])
+    serie = consultar(cubos, "ingresos_mensuales", por, "ingreso", regiones, anios)
+    if por_habitante and not por_entidad:
+        # Promedio nacional: ingreso de cada entidad por su población, entre la población
+        habitantes = cubos.poblacion.reindex(serie["nombreEntidad2"].astype(str)).to_numpy()
+        serie = serie.assign(ingreso=serie["ingreso"] * habitantes, habitantes=habitantes)
+        serie = serie.groupby(["anio", "mes"], observed=True, sort=False)[["ingreso", "habitantes"]].sum()
+        serie = serie.assign(ingreso=serie["ingreso"] / serie["habitantes"]).reset_index()
+    periodo = pd.to_datetime(pd.DataFrame({
+        "year": serie["anio"].astype("int64"),
+        "month": serie["mes"].cat.codes.astype("int64") + 1,
+        "day": 1,
+    }))
+    datos = pd.DataFrame({"Periodo": periodo})
+    if por_entidad:
+        datos["Entidad"] = serie["nombreEntidad2"]
+    datos["Total Ingresos"] = serie["ingreso"]
+    return datos.sort_values(list(datos.columns[:-1]), kind="stable").reset_index(drop=True)
+
+
+# Medida de cada tabla de hechos y cuantil normal del intervalo de confianza
+MEDIDAS_PRECISION = {"gastos": "gasto_tri", "ingresos": "ing_tri"}
+Z_95 = 1.959963984540054
+
+
+def precision(cubos, cubo, regiones=None, anios=None):
+    """Total estimado de cada entidad con su error estándar de diseño.
+
+    Sólo para cubos ponderados; usa las filas de la tabla de hechos de `cubo`
+    ("gastos" o "ingresos") con diseño muestral. Regresa Entidad, Total,
+    Error estándar, CV (%), límites del intervalo al 95% y UPMs.
+    """
+    medida = MEDIDAS_PRECISION[cubo]
+    clave = ("precision", cubo, normalizar_filtros(regiones, anios))
+
+    def calcular():
+        hechos = cubos.hechos[cubo]
+        estimacion = hechos.estimar(
+            "nombreEntidad2", medida, mascara=hechos.mascara(region=regiones, anio=anios)
+        )
+        total = estimacion[medida].to_numpy()
+        error = estimacion[medida + "_ee"].to_numpy()
+        if cubos.poblacion is not None:
+            habitantes = cubos.poblacion.reindex(estimacion["nombreEntidad2"].astype(str)).to_numpy()
+            total, error = total / habitantes, error / habitantes
+        tabla = pd.DataFrame({
+            "Entidad": estimacion["nombreEntidad2"],
+            "Total": total,
+            "Error estándar": error,
+            "CV (%)": np.divide(error * 100, total, out=np.full_like(total, np.nan), where=total != 0),
+            "IC 95% inferior": total - Z_95 * error,
+            "IC 95% superior": total + Z_95 * error,
+            "UPMs": estimacion["upm"],
+        })
+        return tabla.dropna(subset=["Total"]).sort_values("Total", ascending=False, ignore_index=True)
+
+    return cubos.memo.obtener_o_calcular(clave, calcular)
+
+
+def patrones(cubos, anio):
+    tabla = patrones_consumo(rebanar(cubos, "gastos", anio))
+    mayor, menor = categorias_mas_repetidas(tabla)
+    return Patrones(tabla=tabla, categoria_mayor=mayor, categoria_menor=menor)
+
+
+def totales_ingresos_egresos(cubos):
+    """Ingreso y egreso total de cada entidad (todas las filas)."""
+    datos = consultar(cubos, "ingresos", "nombreEntidad2", "ing_tri").merge(
+        consultar(cubos, "gastos", "nombreEntidad2", "gasto_tri"),
+        on="nombreEntidad2",
+        how="inner",
+    )
+    datos.columns = ["Entidad", "Ingreso total", "Egreso total"]
+    return datos
+
+
+# Agrupaciones disponibles para la regresión
+POR_REGRESION = [None, "anio", "region"]
+
+
+def puntos_regresion(cubos, por=None):
+    """Puntos del modelo: una entidad por fila o, con por="anio", una (anio, entidad)."""
+    if por == "anio":
+        matriz = cubos.utilidad
+        filas, columnas = np.nonzero(matriz.completa)
+        return pd.DataFrame({
+            "anio": matriz.anios[filas],
+            "Entidad": matriz.entidades[columnas],
+            "Ingreso total": matriz.ingresos[filas, columnas],
+            "Egreso total": matriz.egresos[filas, columnas],
+        })
+    datos = totales_ingresos_egresos(cubos)
+    if por == "region":
+        regiones = cubos.ingresos.drop_duplicates("nombreEntidad2")
+        region = dict(zip(regiones["nombreEntidad2"].astype(str), regiones["region"].astype(str)))
+        datos = datos.assign(region=datos["Entidad"].astype(str).map(region))
+    return datos
+
+
+def regresion(cubos, por=None):
+    """Regresión lineal del egreso total contra el ingreso total por entidad.
+
+    `por` ("anio" o "region") ajusta una recta por grupo. Los coeficientes y
+    métricas se calculan con estadísticos suficientes (regresion.py) y se
+    guardan en la caché de los cubos.
+    """
+    if por not in POR_REGRESION:
+        raise ValueError(f"Agrupación de regresión desconocida: {por!r}")
+
+    def calcular():
+        datos = puntos_regresion(cubos, por)
+        if por is None:
+            grupos, etiquetas = np.zeros(len(datos), dtype=np.int64), []
+        else:
+            grupos, etiquetas = pd.factorize(datos[por], sort=True)
+        egreso = datos["Egreso total"].to_numpy(dtype="float64")
+        ajustes = ajustar(datos["Ingreso total"], egreso, grupos)
+        if por is not None:
+            ajustes.insert(0, por, etiquetas)
+        # Métricas conjuntas: errores fuera de muestra contra la varianza dentro de cada grupo
+        sse = float(np.nansum(ajustes["mse_cv"] * ajustes["n"]))
+        media = np.bincount(grupos, weights=egreso) / np.maximum(np.bincount(grupos), 1)
+        sst = float(((egreso - media[grupos]) ** 2).sum())
+        return Regresion(
+            datos=datos,
+            ajustes=ajustes,
+            por=por,
+            r2=1 - sse / sst if sst > 0 else float("nan"),
+            mse=sse / len(egreso) if len(egreso) else float("nan"),
+        )
+
+    return cubos.memo.obtener_o_calcular(("regresion", por), calcular)
+
+
+def mapas(cubos, coordenadas, regiones=None, anios=None):
+    """Totales por entidad de los filtros dados junto a sus coordenadas (0 si no hay datos).
+
+    `coordenadas` es un geo.Coordenadas; los totales salen de la caché de
+    consultas de los cubos.
+    """
+    gastos = consultar(cubos, "gastos", "nombreEntidad2", "gasto_tri", regiones, anios)
+    ingresos = consultar(cubos, "ingresos", "nombreEntidad2", "ing_tri", regiones, anios)
+    return Mapas(
+        gastos=coordenadas.tabla(**{"Gasto Total": coordenadas.valores(gastos, "gasto_tri")}),
+        ingresos=coordenadas.tabla(**{"Ingreso Total": coordenadas.valores(ingresos, "ing_tri")}),
+    )
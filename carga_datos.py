@@ -0,0 +1,285 @@
+"""Carga de los archivos unificados de la ENIGH (gastos e ingresos).
+
+El formato nativo es un dataset Parquet particionado por `anio` y
+`claveEntidad` (``gastosUnificados.parquet/``, ``ingresosUnificados.parquet/``)
+que genera el ETL; si no existe se lee el CSV unificado como respaldo. El
+CSV que escribe el ETL guarda las claves de entidad y de categoría en lugar de
+sus etiquetas; éstas se resuelven al leer con las tablas de dimensiones que
+quedan junto a él (gastosUnificados.entidades.csv, ...).
+
+Cada lectura se guarda en una caché del proceso indexada por ruta, columnas y
+filtros. Una entrada se invalida únicamente cuando cambia la fecha de
+modificación o el tamaño de los archivos, de modo que cada rerun de Streamlit
+reutiliza el mismo DataFrame en memoria.
+"""
+import os
+import shutil
+import threading
+
+import pandas as pd
+
+# Columnas de texto muy repetidas que se guardan como categóricas
+COLUMNAS_CATEGORICAS = [
+    "region",
+    "nombreEntidad2",
+    "categoria",
+    "descripcion",
+    "lugar_comp",
+    "forma_pag1",
+    "mes_1", "mes_2", "mes_3", "mes_4", "mes_5", "mes_6",
+]
+
+# Tipos enteros pequeños
+COLUMNAS_ENTERAS = {
+    "anio": "int16",
+    "claveEntidad": "int8",
+}
+
+# Particiones del dataset columnar
+COLUMNAS_PARTICION = ["anio", "claveEntidad"]
+
+# Columnas que lee el dashboard de cada archivo
+COLUMNAS_GASTOS = [
+    "anio", "region", "nombreEntidad2", "categoria", "descripcion",
+    "lugar_comp", "forma_pag1", "gasto_tri",
+]
+COLUMNAS_INGRESOS = [
+    "anio", "region", "nombreEntidad2", "descripcion",
+    "mes_1", "mes_2", "mes_3", "mes_4", "mes_5", "mes_6",
+    "ing_1", "ing_2", "ing_3", "ing_4", "ing_5", "ing_6", "ing_tri",
+]
+
+# Diseño muestral de la ENIGH: factor de expansión, unidad primaria de
+# muestreo y estrato. Sólo algunos años lo traen; se leen si el archivo tiene
+# las columnas y en las filas sin diseño el factor queda nulo.
+COLUMNAS_DISENIO = ["factor", "upm", "est_dis"]
+COLUMNAS_IDENTIFICADORES = ["upm", "est_dis"]
+
+# Dimensiones que el CSV unificado guarda como clave: {nombre: columna clave}.
+# La tabla de cada una se escribe junto al CSV (ver ruta_dimension).
+DIMENSIONES_CSV = {"entidades": "claveEntidad", "categorias": "clave"}
+
+# Meses del calendario; `ing_i` es el ingreso del mes indicado en `mes_i`
+MESES_CALENDARIO = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+]
+
+MAX_ENTRADAS_CACHE = 8
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def ruta_parquet(ruta):
+    """gastosUnificados.csv -> gastosUnificados.parquet"""
+    return os.path.splitext(ruta)[0] + ".parquet"
+
+
+def ruta_dimension(ruta, nombre):
+    """gastosUnificados.csv, "entidades" -> gastosUnificados.entidades.csv"""
+    return f"{os.path.splitext(ruta)[0]}.{nombre}.csv"
+
+
+def dimensiones_csv(ruta, encabezado):
+    """{columna de etiqueta: Dimension} que resuelve las etiquetas faltantes del CSV `ruta`."""
+    # Import diferido: dimensiones.py usa este módulo
+    from dimensiones import leer_dimension
+
+    etiquetas = {}
+    for nombre, clave in DIMENSIONES_CSV.items():
+        archivo = ruta_dimension(ruta, nombre)
+        if clave in encabezado and os.path.exists(archivo):
+            dimension = leer_dimension(archivo, clave)
+            etiquetas.update({c: dimension for c in dimension.columnas if c not in encabezado})
+    return etiquetas
+
+
+def existe_fuente(ruta):
+    return os.path.isdir(ruta_parquet(ruta)) or os.path.exists(ruta)
+
+
+def firma_archivo(ruta):
+    """Regresa (ruta absoluta, mtime, tamaño); cambia cuando cambia el archivo.
+
+    Para un directorio Parquet se usa el mtime más reciente y el tamaño total
+    de todos sus archivos.
+    """
+    if not os.path.isdir(ruta):
+        info = os.stat(ruta)
+        return (os.path.abspath(ruta), info.st_mtime_ns, info.st_size)
+
+    mtime, tamanio = os.stat(ruta).st_mtime_ns, 0
+    for raiz, _, archivos in os.walk(ruta):
+        mtime = max(mtime, os.stat(raiz).st_mtime_ns)
+        for nombre in archivos:
+            info = os.stat(os.path.join(raiz, nombre))
+            mtime = max(mtime, info.st_mtime_ns)
+            tamanio += info.st_size
+    return (os.path.abspath(ruta), mtime, tamanio)
+
+
+def tipar(df, medida):
+    """Aplica los tipos del dashboard y limpia la columna de montos `medida`.
+
+    La medida puede venir como texto porque la ENIGH trae valores en blanco;
+    se convierte a numérico, se descartan las filas inválidas y se guarda
+    como float32.
+    """
+    for columna in COLUMNAS_CATEGORICAS:
+        if columna in df.columns and df[columna].dtype != "category":
+            df[columna] = df[columna].astype("category")
+    for columna, tipo in COLUMNAS_ENTERAS.items():
+        if columna in df.columns:
+            df[columna] = df[columna].astype(tipo)
+    # Identificadores del diseño: enteros con nulo, así se codifican como dimensiones
+    for columna in COLUMNAS_IDENTIFICADORES:
+        if columna in df.columns:
+            df[columna] = pd.to_numeric(df[columna], errors="coerce").astype("Int64")
+    if "factor" in df.columns:
+        df["factor"] = pd.to_numeric(df["factor"], errors="coerce").astype("float32")
+    df[medida] = pd.to_numeric(df[medida], errors="coerce").astype("float32")
+    return df.dropna(subset=[medida]).reset_index(drop=True)
+
+
+def _filtros_parquet(filtros):
+    return [(columna, "in", list(valores)) for columna, valores in filtros]
+
+
+def leer_parquet(ruta, medida, columnas=None, filtros=()):
+    """Lee solo las columnas y particiones necesarias del dataset Parquet."""
+    df = pd.read_parquet(
+        ruta,
+        columns=columnas,
+        filters=_filtros_parquet(filtros) or None,
+    )
+    # Las columnas de partición regresan como categóricas; tipar las
+    # convierte de nuevo a enteros
+    return tipar(df, medida)
+
+
+def leer_csv(ruta, medida, columnas=None, filtros=()):
+    """Lee el CSV unificado (formato de respaldo).
+
+    Las etiquetas que el CSV guarda como clave se unen desde sus dimensiones
+    como categóricas; las claves que no se pidieron no se conservan.
+    """
+    encabezado = pd.read_csv(ruta, nrows=0).columns
+    etiquetas = dimensiones_csv(ruta, encabezado)
+    pedidas = list(encabezado) + list(etiquetas) if columnas is None else list(columnas)
+    # {clave: (dimensión, etiquetas pedidas que resuelve)}
+    uniones = {}
+    for columna in pedidas:
+        if columna in etiquetas:
+            dimension = etiquetas[columna]
+            uniones.setdefault(dimension.clave, (dimension, []))[1].append(columna)
+    leidas = [c for c in pedidas if c not in etiquetas]
+    leidas += [c for c in uniones if c not in leidas]
+
+    tipos = {c: "category" for c in COLUMNAS_CATEGORICAS if c in encabezado}
+    tipos.update({c: t for c, t in COLUMNAS_ENTERAS.items() if c in encabezado})
+    df = pd.read_csv(ruta, usecols=leidas, dtype=tipos, low_memory=False)
+    for dimension, resueltas in uniones.values():
+        df = dimension.unir(df, columnas=resueltas)
+    df = df[pedidas]
+    for columna, valores in filtros:
+        df = df[df[columna].isin(valores)]
+    return tipar(df, medida)
+
+
+def _normalizar_filtros(filtros):
+    if not filtros:
+        return ()
+    return tuple(sorted((c, tuple(sorted(v))) for c, v in filtros.items()))
+
+
+def fuente_datos(ruta):
+    """Ruta que realmente se lee: el dataset Parquet si existe, si no el CSV."""
+    fuente = ruta_parquet(ruta)
+    return fuente if os.path.isdir(fuente) else ruta
+
+
+def columnas_fuente(ruta):
+    """Columnas de la fuente de `ruta` (las de partición incluidas)."""
+    fuente = fuente_datos(ruta)
+    if os.path.isdir(fuente):
+        # pyarrow sólo hace falta con el dataset Parquet
+        import pyarrow.dataset as ds
+
+        return list(ds.dataset(fuente, format="parquet", partitioning="hive").schema.names)
+    encabezado = list(pd.read_csv(fuente, nrows=0).columns)
+    return encabezado + list(dimensiones_csv(fuente, encabezado))
+
+
+def firma_fuente(ruta):
+    """Firma de la fuente de `ruta`; sirve como clave de cachés derivadas."""
+    return firma_archivo(fuente_datos(ruta))
+
+
+def _cargar(ruta, medida, columnas, filtros):
+    fuente = fuente_datos(ruta)
+    es_parquet = os.path.isdir(fuente)
+
+    firma = firma_archivo(fuente)
+    columnas = tuple(columnas) if columnas else None
+    filtros = _normalizar_filtros(filtros)
+    clave = (firma[0], columnas, filtros)
+    with _lock:
+        entrada = _cache.get(clave)
+    if entrada is not None and entrada[0] == firma:
+        return entrada[1]
+
+    lector = leer_parquet if es_parquet else leer_csv
+    df = lector(fuente, medida, list(columnas) if columnas else None, filtros)
+    with _lock:
+        # Se descartan versiones viejas del archivo y las entradas más antiguas
+        for otra in [k for k, v in _cache.items() if k[0] == firma[0] and v[0] != firma]:
+            del _cache[otra]
+        _cache[clave] = (firma, df)
+        while len(_cache) > MAX_ENTRADAS_CACHE:
+            del _cache[next(iter(_cache))]
+    return df
+
+
+def cargar_gastos(ruta="gastosUnificados.csv", columnas=None, filtros=None):
+    """DataFrame de gastos compartido por todo el proceso. No modificarlo.
+
+    `columnas` limita las columnas leídas y `filtros` ({columna: valores})
+    las filas; con Parquet ambos se aplican al leer.
+    """
+    return _cargar(ruta, "gasto_tri", columnas, filtros)
+
+
+def cargar_ingresos(ruta="ingresosUnificados.csv", columnas=None, filtros=None):
+    """DataFrame de ingresos compartido por todo el proceso. No modificarlo."""
+    return _cargar(ruta, "ing_tri", columnas, filtros)
+
+
+def exportar_parquet(df, ruta, medida, anexar=False, bloque=0):
+    """Escribe `df` como dataset Parquet particionado por anio y claveEntidad.
+
+    `ruta` es la del CSV unificado; el dataset se escribe junto a él con
+    extensión .parquet y reemplaza cualquier versión anterior, salvo con
+    `anexar=True`, que agrega archivos nuevos (escritura por bloques).
+    `bloque` es el número del bloque: los archivos se llaman
+    bloque-<número>-<i>.parquet para que, al leer, el orden de los archivos
+    (y de las filas) de cada partición sea el de escritura en cada corrida.
+    """
+    destino = ruta_parquet(ruta)
+    df = tipar(df.copy(), medida)
+    # Columnas con tipos mezclados (números y blancos) se guardan como texto
+    for columna in df.columns:
+        if df[columna].dtype == object:
+            df[columna] = df[columna].astype("string")
+    if not anexar and os.path.isdir(destino):
+        shutil.rmtree(destino)
+    df.to_parquet(
+        destino, partition_cols=COLUMNAS_PARTICION, index=False,
+        basename_template=f"bloque-{bloque:06d}-{{i}}.parquet",
+    )
+    return destino
+
+
+def limpiar_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,175 @@
+"""Columnas tipadas en archivos mapeados en memoria, compartidas entre procesos.
+
+Con varios procesos de Streamlit detrás de un balanceador, cada uno cargaría
+su propia copia de las tablas de hechos. Este módulo permite que un proceso
+cargador las materialice una sola vez como arreglos .npy (códigos de cada
+dimensión y medidas float32) en un directorio junto a los archivos
+unificados::
+
+    gastosUnificados.columnas/
+        manifiesto.json      # filas, diccionarios, tipos y firma de la fuente
+        anio.npy
+        nombreEntidad2.npy
+        ...
+        gasto_tri.npy
+
+Los procesos del dashboard abren esos arreglos con ``np.load(mmap_mode="r")``:
+no leen ni convierten nada, y las páginas viven en la caché del sistema
+operativo, una sola vez para todos los procesos. `cargar_hechos` usa las
+columnas automáticamente si existen y corresponden a la versión actual de la
+fuente; si no, lee la fuente como siempre.
+
+Uso (después de correr el ETL):
+
+    python compartido.py --datos .
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import (
+    COLUMNAS_DISENIO, COLUMNAS_GASTOS, COLUMNAS_INGRESOS, columnas_fuente, firma_archivo, fuente_datos,
+)
+from hechos import TablaHechos, cargar_hechos, diccionario
+
+MANIFIESTO = "manifiesto.json"
+VERSION_COLUMNAS = 1
+
+
+def ruta_columnas(ruta):
+    """gastosUnificados.csv -> gastosUnificados.columnas"""
+    return os.path.splitext(ruta)[0] + ".columnas"
+
+
+def _firma(ruta):
+    # La firma se guarda en JSON: lista en lugar de tupla
+    return list(firma_archivo(fuente_datos(ruta)))
+
+
+def exportar(tabla, destino, firma=None):
+    """Escribe las columnas de `tabla` en `destino` como arreglos .npy.
+
+    Se escribe en un directorio temporal que luego reemplaza a `destino`; los
+    procesos que ya tenían mapeada la versión anterior la siguen leyendo sin
+    problema hasta que la suelten.
+    """
+    temporal = f"{destino}.tmp-{os.getpid()}"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    dimensiones = {}
+    for columna, (codigos, dic) in tabla.dimensiones.items():
+        np.save(os.path.join(temporal, f"{columna}.npy"), codigos)
+        dimensiones[columna] = {
+            "tipo": str(dic.dtype),
+            "valores": dic.tolist(),
+        }
+    for medida, valores in tabla.medidas.items():
+        np.save(os.path.join(temporal, f"{medida}.npy"), valores)
+    manifiesto = {
+        "version": VERSION_COLUMNAS,
+        "firma": firma,
+        "filas": tabla.filas,
+        "dimensiones": dimensiones,
+        "medidas": list(tabla.medidas),
+    }
+    with open(os.path.join(temporal, MANIFIESTO), "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False)
+
+    anterior = f"{destino}.old-{os.getpid()}"
+    if os.path.isdir(destino):
+        os.rename(destino, anterior)
+    os.rename(temporal, destino)
+    shutil.rmtree(anterior, ignore_errors=True)
+
+
+def leer_manifiesto(directorio):
+    """Manifiesto de `directorio`, o None si no hay columnas válidas."""
+    try:
+        with open(os.path.join(directorio, MANIFIESTO), encoding="utf-8") as archivo:
+            manifiesto = json.load(archivo)
+    except (OSError, ValueError):
+        return None
+    return manifiesto if manifiesto.get("version") == VERSION_COLUMNAS else None
+
+
+def _abrir(directorio, columna, filas):
+    ruta = os.path.join(directorio, f"{columna}.npy")
+    # Un arreglo vacío no se puede mapear
+    return np.load(ruta, mmap_mode="r" if filas else None)
+
+
+def adjuntar(directorio, manifiesto=None):
+    """TablaHechos cuyas columnas son mapas de sólo lectura de `directorio`.
+
+    Los diccionarios se registran en hechos.py, así gastos e ingresos vuelven
+    a compartir el mismo objeto por columna.
+    """
+    manifiesto = manifiesto or leer_manifiesto(directorio)
+    if manifiesto is None:
+        raise FileNotFoundError(f"No hay columnas compartidas en {directorio!r}")
+    filas = manifiesto["filas"]
+    dimensiones = {}
+    for columna, info in manifiesto["dimensiones"].items():
+        valores = pd.Index(info["valores"], dtype=info["tipo"])
+        dic = diccionario(columna, valores)
+        # Los códigos en disco apuntan a este orden; sólo se comparte un diccionario idéntico
+        if not dic.equals(valores):
+            dic = valores
+        dimensiones[columna] = (_abrir(directorio, columna, filas), dic)
+    medidas = {m: _abrir(directorio, m, filas) for m in manifiesto["medidas"]}
+    return TablaHechos(filas=filas, dimensiones=dimensiones, medidas=medidas)
+
+
+def adjuntar_vigente(ruta, columnas=None):
+    """Columnas compartidas de `ruta` si corresponden a su fuente actual, si no None."""
+    directorio = ruta_columnas(ruta)
+    manifiesto = leer_manifiesto(directorio)
+    if manifiesto is None or manifiesto["firma"] != _firma(ruta):
+        return None
+    disponibles = set(manifiesto["dimensiones"]) | set(manifiesto["medidas"])
+    if columnas and not set(columnas) <= disponibles:
+        return None
+    tabla = adjuntar(directorio, manifiesto)
+    if columnas:
+        tabla = TablaHechos(
+            filas=tabla.filas,
+            dimensiones={c: v for c, v in tabla.dimensiones.items() if c in columnas},
+            medidas={c: v for c, v in tabla.medidas.items() if c in columnas},
+        )
+    return tabla
+
+
+def materializar(ruta, medida, columnas=None):
+    """Lee la fuente de `ruta` y exporta sus columnas junto a ella."""
+    firma = _firma(ruta)
+    tabla = cargar_hechos(ruta, medida, columnas=columnas, compartidas=False)
+    destino = ruta_columnas(ruta)
+    exportar(tabla, destino, firma=firma)
+    return destino, tabla
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Materializa las columnas de los archivos unificados para compartirlas entre procesos"
+    )
+    parser.add_argument("--datos", default=".", help="directorio de los archivos unificados")
+    args = parser.parse_args(argv)
+
+    for nombre, medida, columnas in [
+        ("gastosUnificados.csv", "gasto_tri", COLUMNAS_GASTOS),
+        ("ingresosUnificados.csv", "ing_tri", COLUMNAS_INGRESOS),
+    ]:
+        ruta = os.path.join(args.datos, nombre)
+        # El diseño muestral va también si el archivo lo trae
+        columnas = columnas + [c for c in COLUMNAS_DISENIO if c in columnas_fuente(ruta)]
+        destino, tabla = materializar(ruta, medida, columnas)
+        print(f"{destino}: {tabla.filas} filas, {tabla.memoria() / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+"""Cubos de sumas pre-agregadas para el dashboard.
+
+Cada gráfica del dashboard es una suma de `gasto_tri` o `ing_tri` sobre algún
+subconjunto de (anio, region, entidad, categoria, descripcion, lugar_comp,
+forma_pag1). Los cubos materializan esas sumas una sola vez al cargar los
+datos; tienen miles de filas en lugar de millones, así que el costo de
+filtrar y agrupar ya no depende del tamaño de los archivos originales.
+
+Los archivos se cargan como tablas de hechos compactas (hechos.py) y los
+cubos se agregan directamente sobre sus códigos.
+
+Si los archivos traen el diseño muestral de la ENIGH (factor, upm, est_dis)
+hay además cubos ponderados, cuyas medidas son estimaciones poblacionales con
+el factor de expansión; salen de las mismas pasadas del kernel de sumas que
+los cubos de la muestra. Cualquiera de las dos variantes se puede expresar
+por habitante de cada entidad con dataPoblacion.xlsx. Las demás funciones no
+distinguen variantes: leen las mismas columnas.
+"""
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import (
+    COLUMNAS_DISENIO, COLUMNAS_GASTOS, COLUMNAS_INGRESOS, MESES_CALENDARIO,
+    columnas_fuente, firma_archivo, firma_fuente,
+)
+from dimensiones import leer_dimension
+from hechos import SUFIJO_PONDERADO, TablaHechos, cargar_hechos
+from memo import CacheLRU
+from trazas import tramo
+
+# Granularidad de cada cubo
+DIMENSIONES_GASTOS = ["anio", "region", "nombreEntidad2", "categoria", "descripcion"]
+DIMENSIONES_INGRESOS = ["anio", "region", "nombreEntidad2", "descripcion"]
+DIMENSIONES_ENTIDAD = ["anio", "region", "nombreEntidad2"]
+
+COLUMNAS_INGRESO_MENSUAL = ["ing_1", "ing_2", "ing_3", "ing_4", "ing_5", "ing_6"]
+COLUMNAS_MES = ["mes_1", "mes_2", "mes_3", "mes_4", "mes_5", "mes_6"]
+
+# Medida de cada cubo
+MEDIDAS = {
+    "gastos": "gasto_tri",
+    "ingresos": "ing_tri",
+    "lugar_comp": "gasto_tri",
+    "forma_pago": "gasto_tri",
+    "ingresos_mensuales": "ingreso",
+}
+
+# Columna con el factor de expansión
+PESOS = "factor"
+
+# Orden físico de los cubos; cada prefijo queda en rangos contiguos de filas
+ORDEN_INDICE = ["anio", "nombreEntidad2", "categoria"]
+
+
+@dataclass
+class Cubos:
+    gastos: pd.DataFrame  # anio, region, entidad, categoria, descripcion -> gasto_tri
+    ingresos: pd.DataFrame  # anio, region, entidad, descripcion -> ing_tri
+    lugar_comp: pd.DataFrame  # anio, region, entidad, lugar_comp -> gasto_tri
+    forma_pago: pd.DataFrame  # anio, region, entidad, forma_pag1 -> gasto_tri
+    ingresos_mensuales: pd.DataFrame  # anio, region, entidad, mes -> ingreso
+    utilidad: "MatrizUtilidad"  # ingresos, egresos y utilidad por (anio × entidad)
+    # Los archivos traen el diseño muestral (hay variante ponderada)
+    disenio: bool = False
+    # Medidas estimadas con el factor de expansión en lugar de sumas de la muestra
+    ponderado: bool = False
+    # Habitantes por nombreEntidad2 si las medidas están por habitante
+    poblacion: pd.Series = None
+    # {"gastos": TablaHechos, "ingresos": TablaHechos} de los que salen los cubos
+    hechos: dict = field(default_factory=dict, repr=False, compare=False)
+    # Resultados de `consultar` por estado de filtros; vive lo que viven los cubos
+    memo: CacheLRU = field(default_factory=CacheLRU, repr=False, compare=False)
+    # {(cubo, claves): IndiceFilas} para las rebanadas del drill-down
+    indices: dict = field(default_factory=dict, repr=False, compare=False)
+
+
+@dataclass
+class MatrizUtilidad:
+    """Ingresos, egresos y utilidad alineados en matrices (anio × entidad).
+
+    Una celda sin ingresos o sin egresos vale 0 en esa medida; `completa`
+    marca las celdas que tienen ambos.
+    """
+    anios: pd.Index
+    entidades: pd.Index
+    ingresos: np.ndarray
+    egresos: np.ndarray
+    utilidad: np.ndarray
+    completa: np.ndarray
+
+    def fila(self, anio):
+        """Posición de `anio` en las filas (-1 si no hay datos de ese año)."""
+        return int(self.anios.get_indexer([int(anio)])[0])
+
+    def celda(self, anio, entidad):
+        """(ingresos, egresos, utilidad) de una entidad en un año; ceros si no hay datos."""
+        i, j = self.fila(anio), int(self.entidades.get_indexer([entidad])[0])
+        if i < 0 or j < 0:
+            return 0.0, 0.0, 0.0
+        return float(self.ingresos[i, j]), float(self.egresos[i, j]), float(self.utilidad[i, j])
+
+
+class IndiceFilas:
+    """Rango de filas [inicio, fin) de cada valor de `claves` en `df`.
+
+    `df` debe estar ordenado por `claves` (o por un orden que las incluya como
+    prefijo), así cada grupo es un bloque contiguo y obtenerlo es un
+    `iloc[inicio:fin]`, sin recorrer las columnas.
+    """
+
+    def __init__(self, df, claves):
+        self.df = df
+        self.claves = list(claves)
+        grupos = df.groupby(self.claves, observed=True, sort=False).indices
+        self.rangos = {
+            self._normalizar(clave): (int(posiciones[0]), int(posiciones[-1]) + 1)
+            for clave, posiciones in grupos.items()
+        }
+
+    @staticmethod
+    def _normalizar(clave):
+        clave = clave if isinstance(clave, tuple) else (clave,)
+        return tuple(int(v) if isinstance(v, (int, np.integer)) else str(v) for v in clave)
+
+    def __contains__(self, clave):
+        return self._normalizar(clave) in self.rangos
+
+    def valores(self):
+        return list(self.rangos)
+
+    def rebanada(self, *clave):
+        inicio, fin = self.rangos.get(self._normalizar(clave), (0, 0))
+        return self.df.iloc[inicio:fin]
+
+
+def agregar(df, dimensiones, medidas, pesos=None):
+    """Suma `medidas` por `dimensiones`. Las sumas se acumulan en float64.
+
+    `df` puede ser un DataFrame o una TablaHechos. Con `pesos` se agregan
+    también las sumas ponderadas y la de los pesos (ver TablaHechos.sumar).
+    """
+    if isinstance(df, TablaHechos):
+        return df.sumar(dimensiones, medidas, pesos=pesos)
+    medidas = [medidas] if isinstance(medidas, str) else list(medidas)
+    valores = df[medidas].astype("float64")
+    if pesos is not None:
+        peso = df[pesos].astype("float64")
+        peso = peso.where(peso > 0, 0.0)
+        valores = valores.assign(
+            **{m + SUFIJO_PONDERADO: valores[m] * peso for m in medidas}, **{pesos: peso}
+        )
+    return (
+        valores.groupby([df[d] for d in dimensiones], observed=True)
+        .sum()
+        .reset_index()
+    )
+
+
+def matriz_utilidad(gastos, ingresos):
+    """MatrizUtilidad a partir de los cubos de gastos e ingresos."""
+    por = ["anio", "nombreEntidad2"]
+    tabla_ingresos = sumar(ingresos, por, "ing_tri").set_index(por)["ing_tri"].unstack()
+    tabla_egresos = sumar(gastos, por, "gasto_tri").set_index(por)["gasto_tri"].unstack()
+    anios = tabla_ingresos.index.union(tabla_egresos.index).astype("int16")
+    entidades = pd.Index(tabla_ingresos.columns.union(tabla_egresos.columns, sort=False).astype(str))
+    tabla_ingresos = tabla_ingresos.reindex(index=anios, columns=entidades).to_numpy(dtype="float64")
+    tabla_egresos = tabla_egresos.reindex(index=anios, columns=entidades).to_numpy(dtype="float64")
+    completa = ~(np.isnan(tabla_ingresos) | np.isnan(tabla_egresos))
+    tabla_ingresos = np.nan_to_num(tabla_ingresos)
+    tabla_egresos = np.nan_to_num(tabla_egresos)
+    return MatrizUtilidad(
+        anios=anios,
+        entidades=entidades,
+        ingresos=tabla_ingresos,
+        egresos=tabla_egresos,
+        utilidad=tabla_ingresos - tabla_egresos,
+        completa=completa,
+    )
+
+
+def agregar_por_mes(df, dimensiones, pesos=None):
+    """Ingreso por mes calendario: cada `ing_i` se suma al mes de `mes_i`.
+
+    Las filas cuyo mes es nulo o "no aplica" no cuentan. `mes` queda como
+    categórica ordenada enero..diciembre. Con `pesos`, como en `agregar`.
+    """
+    partes = []
+    for ingreso, mes in zip(COLUMNAS_INGRESO_MENSUAL, COLUMNAS_MES):
+        parte = agregar(df, dimensiones + [mes], ingreso, pesos)
+        columnas = {"ingreso": parte[ingreso]}
+        if pesos is not None:
+            columnas["ingreso" + SUFIJO_PONDERADO] = parte[ingreso + SUFIJO_PONDERADO]
+            columnas[pesos] = parte[pesos]
+        partes.append(pd.DataFrame({
+            **{d: parte[d] for d in dimensiones},
+            "mes": pd.Categorical(parte[mes], categories=MESES_CALENDARIO, ordered=True),
+            **columnas,
+        }))
+    mensual = pd.concat(partes, ignore_index=True)
+    return agregar(mensual.dropna(subset=["mes"]), dimensiones + ["mes"], list(columnas))
+
+
+def separar(cubo, medida, pesos):
+    """(cubo de sumas, cubo ponderado) de un resultado de `agregar` con `pesos`.
+
+    El ponderado conserva sólo los grupos con peso (filas con diseño
+    muestral) y su medida se llama igual que en el de sumas.
+    """
+    ponderada = medida + SUFIJO_PONDERADO
+    dimensiones = [c for c in cubo.columns if c not in (medida, ponderada, pesos)]
+    ponderado = cubo.loc[cubo[pesos].to_numpy() > 0, dimensiones + [ponderada]]
+    return (
+        cubo[dimensiones + [medida]],
+        ponderado.rename(columns={ponderada: medida}).reset_index(drop=True),
+    )
+
+
+def ordenar(cubo):
+    """Ordena el cubo por ORDEN_INDICE para que sus prefijos sean contiguos."""
+    claves = [c for c in ORDEN_INDICE if c in cubo.columns]
+    return cubo.sort_values(claves, kind="stable").reset_index(drop=True)
+
+
+def indexar(cubos):
+    """Índices de rebanadas por (anio), (anio, entidad) y (anio, entidad, categoria)."""
+    for nombre in ["gastos", "ingresos", "lugar_comp", "forma_pago", "ingresos_mensuales"]:
+        cubo = getattr(cubos, nombre)
+        claves = [c for c in ORDEN_INDICE if c in cubo.columns]
+        for n in range(1, len(claves) + 1):
+            cubos.indices[(nombre, tuple(claves[:n]))] = IndiceFilas(cubo, claves[:n])
+    return cubos
+
+
+def armar(cubos, **atributos):
+    """Cubos (ordenados e indexados) a partir de {nombre: DataFrame} de sumas."""
+    cubos = {nombre: ordenar(cubo) for nombre, cubo in cubos.items()}
+    return indexar(Cubos(
+        **cubos,
+        utilidad=matriz_utilidad(cubos["gastos"], cubos["ingresos"]),
+        **atributos,
+    ))
+
+
+def construir_variantes(df_gastos, df_ingresos, pesos=None):
+    """(cubos de la muestra, {nombre: cubo ponderado} o None).
+
+    Con `pesos` (la columna del factor de expansión) cada suma del kernel
+    acumula a la vez la medida y la medida por el peso, así que los cubos
+    ponderados cuestan una pasada más de np.bincount, no otra agregación.
+    Se regresan sin armar: ordenarlos e indexarlos se hace hasta que se piden.
+    """
+    sumas = {
+        "gastos": agregar(df_gastos, DIMENSIONES_GASTOS, "gasto_tri", pesos),
+        "ingresos": agregar(df_ingresos, DIMENSIONES_INGRESOS, "ing_tri", pesos),
+        "lugar_comp": agregar(df_gastos, DIMENSIONES_ENTIDAD + ["lugar_comp"], "gasto_tri", pesos),
+        "forma_pago": agregar(df_gastos, DIMENSIONES_ENTIDAD + ["forma_pag1"], "gasto_tri", pesos),
+        "ingresos_mensuales": agregar_por_mes(df_ingresos, DIMENSIONES_ENTIDAD, pesos),
+    }
+    hechos = {"gastos": df_gastos, "ingresos": df_ingresos}
+    if pesos is None:
+        return armar(sumas, hechos=hechos), None
+    separados = {nombre: separar(cubo, MEDIDAS[nombre], pesos) for nombre, cubo in sumas.items()}
+    return (
+        armar({n: muestra for n, (muestra, _) in separados.items()}, disenio=True, hechos=hechos),
+        {n: ponderado for n, (_, ponderado) in separados.items()},
+    )
+
+
+def construir_cubos(df_gastos, df_ingresos):
+    return construir_variantes(df_gastos, df_ingresos)[0]
+
+
+def leer_poblacion(ruta="dataPoblacion.xlsx"):
+    """Habitantes de cada entidad (índice nombreEntidad2) de dataPoblacion.xlsx."""
+    dimension = leer_dimension(ruta, "claveEntidad")
+    return pd.Series(
+        np.asarray(dimension.atributos["poblacion"], dtype="float64"),
+        index=pd.Index(np.asarray(dimension.atributos["nombreEntidad2"]).astype(str)),
+        name="poblacion",
+    )
+
+
+def por_habitante(cubos, poblacion):
+    """Cubos con cada medida dividida entre los habitantes de su entidad.
+
+    Las filas de entidades sin población conocida se descartan.
+    """
+    divididos = {}
+    for nombre, medida in MEDIDAS.items():
+        cubo = getattr(cubos, nombre)
+        habitantes = poblacion.reindex(cubo["nombreEntidad2"].astype(str)).to_numpy()
+        conocida = ~np.isnan(habitantes)
+        divididos[nombre] = cubo[conocida].assign(
+            **{medida: cubo[medida].to_numpy()[conocida] / habitantes[conocida]}
+        )
+    return armar(
+        divididos, disenio=cubos.disenio, ponderado=cubos.ponderado, poblacion=poblacion, hechos=cubos.hechos
+    )
+
+
+# {(firmas de las fuentes, ponderado, firma de la población): Cubos o None}
+_cache = {}
+# {firmas de las fuentes: (cubos de la muestra, sumas ponderadas o None)}
+_variantes = {}
+_lock = threading.Lock()
+
+
+def _construir(fuentes, ruta_gastos, ruta_ingresos):
+    with _lock:
+        variantes = _variantes.get(fuentes)
+    if variantes is not None:
+        return variantes
+
+    # El diseño muestral se usa sólo si ambos archivos lo traen completo
+    disenio = all(
+        set(COLUMNAS_DISENIO) <= set(columnas_fuente(ruta)) for ruta in (ruta_gastos, ruta_ingresos)
+    )
+    extra = COLUMNAS_DISENIO if disenio else []
+    with tramo("cargar_hechos") as t:
+        hechos_gastos = cargar_hechos(ruta_gastos, "gasto_tri", columnas=COLUMNAS_GASTOS + extra)
+        hechos_ingresos = cargar_hechos(ruta_ingresos, "ing_tri", columnas=COLUMNAS_INGRESOS + extra)
+        t.registrar(filas=hechos_gastos.filas + hechos_ingresos.filas)
+    with tramo("construir_cubos"):
+        variantes = construir_variantes(hechos_gastos, hechos_ingresos, PESOS if disenio else None)
+    with _lock:
+        _variantes.clear()
+        _variantes[fuentes] = variantes
+    return variantes
+
+
+def cargar_cubos(ruta_gastos="gastosUnificados.csv", ruta_ingresos="ingresosUnificados.csv",
+                 ponderado=False, ruta_poblacion=None):
+    """Cubos de los archivos unificados, cacheados mientras no cambien.
+
+    Con `ponderado` las medidas son estimaciones con el factor de expansión
+    (None si los archivos no traen el diseño muestral); con `ruta_poblacion`
+    (dataPoblacion.xlsx) quedan por habitante de cada entidad.
+    """
+    fuentes = (firma_fuente(ruta_gastos), firma_fuente(ruta_ingresos))
+    clave = (fuentes, bool(ponderado), firma_archivo(ruta_poblacion) if ruta_poblacion else None)
+    with _lock:
+        if clave in _cache:
+            return _cache[clave]
+
+    if ruta_poblacion:
+        cubos = cargar_cubos(ruta_gastos, ruta_ingresos, ponderado)
+        if cubos is not None:
+            cubos = por_habitante(cubos, leer_poblacion(ruta_poblacion))
+    elif ponderado:
+        muestra, sumas = _construir(fuentes, ruta_gastos, ruta_ingresos)
+        cubos = None if sumas is None else armar(sumas, disenio=True, ponderado=True, hechos=muestra.hechos)
+    else:
+        cubos = _construir(fuentes, ruta_gastos, ruta_ingresos)[0]
+    with _lock:
+        # Se descartan las variantes de versiones anteriores de los archivos
+        for otra in [k for k in _cache if k[0] != fuentes]:
+            del _cache[otra]
+        _cache[clave] = cubos
+    return cubos
+
+
+def filtrar(cubo, regiones=None, anios=None, entidad=None, categoria=None):
+    """Filas del cubo que cumplen los filtros dados (None = sin filtro)."""
+    mascara = pd.Series(True, index=cubo.index)
+    if regiones is not None:
+        mascara &= cubo["region"].isin(regiones)
+    if anios is not None:
+        mascara &= cubo["anio"].isin(anios)
+    if entidad is not None:
+        mascara &= cubo["nombreEntidad2"] == entidad
+    if categoria is not None:
+        mascara &= cubo["categoria"] == categoria
+    return cubo[mascara]
+
+
+def sumar(cubo, por, medida):
+    """groupby(por)[medida].sum() sobre un cubo, como DataFrame plano."""
+    return cubo.groupby(por, observed=True)[medida].sum().reset_index()
+
+
+def normalizar_filtros(regiones=None, anios=None, entidad=None, categoria=None):
+    """Tupla hashable e independiente del orden de selección en la barra lateral."""
+    return (
+        None if regiones is None else tuple(sorted({str(r) for r in regiones})),
+        None if anios is None else tuple(sorted({int(a) for a in anios})),
+        None if entidad is None else str(entidad),
+        None if categoria is None else str(categoria),
+    )
+
+
+def consultar(cubos, cubo, por, medida, regiones=None, anios=None, entidad=None, categoria=None):
+    """sumar(filtrar(...)) sobre `cubos.<cubo>`, memoizado por estado de filtros.
+
+    Las combinaciones de filtros usadas recientemente se sirven desde la caché
+    LRU de los cubos. El resultado es compartido: no modificarlo.
+    """
+    por = [por] if isinstance(por, str) else list(por)
+    filtros = normalizar_filtros(regiones, anios, entidad, categoria)
+    clave = (cubo, tuple(por), medida, filtros)
+
+    with tramo("consultar", etiqueta=f"{cubo} por {', '.join(por)}") as t:
+        def calcular():
+            regiones_, anios_, entidad_, categoria_ = filtros
+            with tramo("filtrar") as t_filtro:
+                datos = filtrar(getattr(cubos, cubo), regiones_, anios_, entidad_, categoria_)
+                t_filtro.registrar(filas=len(datos))
+            with tramo("sumar") as t_suma:
+                resultado = sumar(datos, por, medida)
+                t_suma.registrar(filas=len(resultado))
+            t.registrar(en_cache=False)
+            return resultado
+
+        t.registrar(en_cache=True)
+        resultado = cubos.memo.obtener_o_calcular(clave, calcular)
+        t.registrar(filas=len(resultado))
+    return resultado
+
+
+def rebanar(cubos, cubo, anio, entidad=None, categoria=None):
+    """Filas de `cubos.<cubo>` para (anio[, entidad[, categoria]]) sin escanear.
+
+    Usa los índices de filas construidos al cargar; regresa una vista
+    contigua del cubo (vacía si la combinación no existe).
+    """
+    clave = [anio] + [v for v in (entidad, categoria) if v is not None]
+    with tramo("rebanar", etiqueta=cubo) as t:
+        indice = cubos.indices[(cubo, tuple(ORDEN_INDICE[:len(clave)]))]
+        rebanada = indice.rebanada(*clave)
+        t.registrar(filas=len(rebanada))
+    return rebanada
+
+
+def entidades(cubos, anio, cubo="gastos"):
+    """Entidades con datos en `anio`, en el orden del cubo."""
+    indice = cubos.indices[(cubo, tuple(ORDEN_INDICE[:2]))]
+    return [e for a, e in indice.valores() if a == int(anio)]
@@ -0,0 +1,110 @@
+"""Tablas de dimensiones con búsqueda por arreglo.
+
+Una dimensión (población por entidad, catálogo de categorías) se carga una
+sola vez y se guarda como columnas alineadas con un código denso 0..n-1. Para
+unirla a una tabla de hechos se calcula el código de cada fila (un índice de
+arreglo para claves enteras, `get_indexer` para claves de texto) y cada
+atributo se obtiene con `take`: los de texto como categóricas que comparten
+el diccionario de la dimensión. Los hechos no se copian y las etiquetas no
+se repiten como cadenas en cada fila.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import firma_archivo
+
+
+class Dimension:
+    """Tabla de dimensión indexada por `clave` (valores únicos)."""
+
+    def __init__(self, tabla, clave):
+        if tabla[clave].duplicated().any():
+            raise ValueError(f"La clave {clave!r} de la dimensión tiene valores repetidos")
+        self.clave = clave
+        self.columnas = [c for c in tabla.columns if c != clave]
+        claves = tabla[clave]
+        self.claves = claves.reset_index(drop=True)
+        self.entera = pd.api.types.is_integer_dtype(claves)
+        if self.entera:
+            # posiciones[clave] = fila de la dimensión (-1 si no existe)
+            valores = claves.to_numpy(dtype="int64")
+            tamanio = int(valores.max()) + 1 if len(valores) else 0
+            self.posiciones = np.full(tamanio, -1, dtype=np.int32)
+            self.posiciones[valores] = np.arange(len(valores), dtype=np.int32)
+        else:
+            self.indice = pd.Index(claves.astype(str))
+        self.atributos = {}
+        for columna in self.columnas:
+            serie = tabla[columna]
+            if pd.api.types.is_numeric_dtype(serie):
+                self.atributos[columna] = serie.to_numpy()
+            else:
+                self.atributos[columna] = pd.Categorical(serie)
+
+    def codigos(self, claves):
+        """Fila de la dimensión de cada clave de `claves` (-1 si no existe)."""
+        if not self.entera:
+            return self.indice.get_indexer(pd.Series(claves).astype(str))
+        valores = pd.to_numeric(pd.Series(claves), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        validos = (valores >= 0) & (valores < len(self.posiciones))
+        codigos = np.full(len(valores), -1, dtype=np.int32)
+        codigos[validos] = self.posiciones[valores[validos].astype(np.int64)]
+        return codigos
+
+    def atributo(self, columna, codigos):
+        """Valores de `columna` para los `codigos` dados (todos válidos)."""
+        valores = self.atributos[columna]
+        if isinstance(valores, pd.Categorical):
+            return pd.Categorical.from_codes(valores.codes.take(codigos), dtype=valores.dtype)
+        return valores.take(codigos)
+
+    def unir(self, hechos, columna=None, columnas=None):
+        """Equivalente a hechos.merge(tabla, on=clave) (unión interna).
+
+        Agrega los atributos de la dimensión (o solo `columnas`) como columnas
+        nuevas; las filas sin clave en la dimensión se descartan.
+        """
+        codigos = self.codigos(hechos[columna or self.clave])
+        encontrados = codigos >= 0
+        if not encontrados.all():
+            hechos = hechos[encontrados].reset_index(drop=True)
+            codigos = codigos[encontrados]
+        return hechos.assign(**{c: self.atributo(c, codigos) for c in columnas or self.columnas})
+
+    def tabla(self):
+        """La dimensión como DataFrame: la clave y sus atributos."""
+        return pd.DataFrame({
+            self.clave: self.claves,
+            **{c: np.asarray(self.atributos[c]) for c in self.columnas},
+        })
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def leer_dimension(ruta, clave, **opciones):
+    """Dimensión de un archivo .xlsx o .csv, cacheada mientras no cambie.
+
+    `opciones` se pasan al lector de pandas (por ejemplo `encoding`).
+    """
+    firma = firma_archivo(ruta)
+    llave = (firma, clave, tuple(sorted(opciones.items())))
+    with _lock:
+        dimension = _cache.get(llave)
+    if dimension is not None:
+        return dimension
+
+    if os.path.splitext(ruta)[1].lower() in (".xlsx", ".xls"):
+        tabla = pd.read_excel(ruta, **opciones)
+    else:
+        tabla = pd.read_csv(ruta, **opciones)
+    dimension = Dimension(tabla, clave)
+    with _lock:
+        for otra in [k for k in _cache if k[0][0] == firma[0] and k[0] != firma]:
+            del _cache[otra]
+        _cache[llave] = dimension
+    return dimension
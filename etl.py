@@ -0,0 +1,539 @@
+"""ETL de la ENIGH: de los CSV crudos por año a los archivos unificados.
+
+Reemplaza las celdas de proyecto.ipynb. Cada archivo crudo (gastos2018.csv,
+ingresos2020.csv, ...) se lee por bloques; cada bloque se limpia, se le
+agregan anio y claveEntidad, se decodifican sus catálogos, se une con
+dataPoblacion.xlsx y el catálogo de categorías y se anexa a la salida. La
+memoria necesaria depende del tamaño del bloque, no del número de años.
+
+El dataset Parquet guarda las etiquetas de esas uniones (como diccionarios);
+el CSV unificado solo guarda claveEntidad y clave, y las dos dimensiones se
+escriben junto a él (gastosUnificados.entidades.csv, ...) para que
+carga_datos resuelva las etiquetas al leerlo.
+
+Del archivo crudo solo se leen las columnas que sobreviven a la limpieza, y
+los montos y códigos se leen directamente como float32 / Int8. Con
+--memoria-mb el tamaño de bloque se calcula para que cada proceso se
+mantenga dentro de ese presupuesto sin importar el tamaño del archivo.
+
+Los años son independientes hasta la concatenación final, así que cada
+(conjunto, año) puede procesarse en un proceso aparte (--trabajadores). El
+resultado de cada año se guarda en partes_etl/ con un manifiesto de huellas
+de sus entradas; en la siguiente ejecución solo se reprocesan los años cuyo
+archivo crudo o catálogos cambiaron (--completo fuerza todo).
+
+Uso:
+    python etl.py --datos ./crudos --salida . --anios 2018 2020 2022 --trabajadores 6
+    python etl.py --datos ./crudos --salida . --memoria-mb 1024
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import (
+    COLUMNAS_DISENIO, MESES_CALENDARIO, exportar_parquet, ruta_dimension, ruta_parquet,
+)
+from dimensiones import leer_dimension
+
+# Avance del ETL; main() lo muestra en la consola, quien lo importe decide
+logger = logging.getLogger(__name__)
+
+ANIOS = [2018, 2020, 2022]
+
+TAMANIO_BLOQUE = 500_000
+
+# Copias simultáneas de un bloque ya unido mientras se escribe: la unión
+# intermedia, la copia tipada para Parquet y el buffer del CSV
+FACTOR_MEMORIA_BLOQUE = 3
+
+# Filas que se leen para estimar los bytes por fila de un archivo crudo
+FILAS_MUESTRA = 10_000
+
+# Valor de las celdas vacías en los archivos crudos de la ENIGH
+BLANCO = " "
+
+# El diseño muestral (factor, upm, est_dis) solo lo traen algunos años; se
+# conserva para las estimaciones ponderadas y en los años que no lo traen las
+# columnas quedan nulas, así todas las partes tienen el mismo encabezado
+TIPOS_DISENIO = {"factor": "float32", "upm": "Int64", "est_dis": "Int64"}
+
+# --- Catálogos (el índice de la lista es el código) ---
+LUGAR_COMP = [
+    "No aplica", "Mercado", "Tianguis o mercado sobre ruedas", "Vendedores ambulantes",
+    "Tiendas de abarrotes", "Tiendas específicas del hogar", "Supermercados",
+    "Tiendas departamentales", "Compras fuera del país", "Tiendas con membresía",
+    "Tiendas de conveniencia", "Restaurantes", "Loncherías, fondas, torterías",
+    "Cafeterías", "Pulquería, cantina o bar", "Diconsa", "Lechería Liconsa",
+    "Persona particular", "Internet",
+]
+
+FORMA_PAG = [
+    "No aplica", "Efectivo", "Fiado (persona)", "Domiciliación",
+    "Transferencia", "Tarjeta de crédito", "Tarjeta de débito",
+    "Cheque", "Vale", "Pago móvil", "Otro",
+]
+
+MESES = ["no aplica"] + MESES_CALENDARIO
+
+
+@dataclass
+class Conjunto:
+    nombre: str  # prefijo de los archivos crudos: gastos2018.csv
+    medida: str
+    salida: str
+    categorias: str
+    codificacion_categorias: str = "utf-8"
+    columnas_eliminar: list = field(default_factory=list)
+    columnas_numericas: list = field(default_factory=list)
+    catalogos: dict = field(default_factory=dict)  # columna -> lista de etiquetas
+    tipos: dict = field(default_factory=dict)  # columna -> dtype al leer el crudo (el resto, texto)
+
+
+GASTOS = Conjunto(
+    nombre="gastos",
+    medida="gasto_tri",
+    salida="gastosUnificados.csv",
+    categorias="categorias.csv",
+    columnas_eliminar=[
+        "foliohog", "tipo_gasto", "forma_pag2", "forma_pag3", "orga_inst",
+        "frecuencia", "fecha_adqu", "fecha_pago", "pago_mp", "costo", "inmujer",
+        "inst_1", "inst_2", "num_meses", "num_pagos", "ultim_pago", "gasto_nm",
+        "gas_nm_tri", "imujer_tri", "entidad",
+    ],
+    columnas_numericas=["cantidad"],
+    catalogos={"lugar_comp": LUGAR_COMP, "forma_pag1": FORMA_PAG},
+    tipos={
+        "lugar_comp": "Int8", "forma_pag1": "Int8",
+        "cantidad": "float32", "gasto": "float32", "gasto_tri": "float32",
+        **TIPOS_DISENIO,
+    },
+)
+
+INGRESOS = Conjunto(
+    nombre="ingresos",
+    medida="ing_tri",
+    salida="ingresosUnificados.csv",
+    categorias="ingresos_categorias.csv",
+    codificacion_categorias="latin1",
+    columnas_eliminar=["foliohog", "entidad"],
+    columnas_numericas=[f"ing_{i}" for i in range(1, 7)],
+    catalogos={f"mes_{i}": MESES for i in range(1, 7)},
+    tipos={
+        **{f"mes_{i}": "Int8" for i in range(1, 7)},
+        **{f"ing_{i}": "float32" for i in range(1, 7)},
+        "ing_tri": "float32",
+        **TIPOS_DISENIO,
+    },
+)
+
+CONJUNTOS = {"gastos": GASTOS, "ingresos": INGRESOS}
+
+
+def clave_entidad(folioviv):
+    """Clave de entidad a partir de folioviv, sin recorrer fila por fila.
+
+    Los folios de 9 dígitos empiezan con la clave de un dígito y los de 10 con
+    la de dos; en ambos casos es folioviv // 10**8. Otras longitudes no son
+    válidas y quedan como nulo.
+    """
+    folio = pd.to_numeric(folioviv, errors="coerce")
+    valido = (folio >= 10**8) & (folio < 10**10)
+    return (folio // 10**8).where(valido).astype("Int64")
+
+
+def decodificar(serie, etiquetas):
+    """Códigos numéricos -> categórica con las `etiquetas` del catálogo.
+
+    Los códigos fuera del catálogo quedan como nulo.
+    """
+    codigos = pd.to_numeric(serie, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    validos = (codigos >= 0) & (codigos <= len(etiquetas) - 1)
+    codigos = np.where(validos, codigos, -1).astype(np.int32)
+    return pd.Categorical.from_codes(codigos, categories=etiquetas)
+
+
+def transformar(bloque, conjunto, anio):
+    """Limpieza de un bloque crudo de un año (lo que hacían las celdas del notebook)."""
+    bloque = bloque.drop(columns=conjunto.columnas_eliminar, errors="ignore")
+    for columna in COLUMNAS_DISENIO:
+        if columna not in bloque.columns:
+            bloque[columna] = pd.Series(index=bloque.index, dtype=TIPOS_DISENIO[columna])
+    for columna in conjunto.columnas_numericas:
+        bloque[columna] = pd.to_numeric(bloque[columna], errors="coerce").fillna(0)
+    bloque[conjunto.medida] = pd.to_numeric(bloque[conjunto.medida], errors="coerce")
+    for columna, etiquetas in conjunto.catalogos.items():
+        if columna in bloque.columns:
+            bloque[columna] = decodificar(bloque[columna], etiquetas)
+    bloque["anio"] = np.int16(anio)
+    bloque["claveEntidad"] = clave_entidad(bloque["folioviv"])
+    return bloque
+
+
+def leer_dimensiones(conjunto, directorio):
+    """Dimensiones de población (por claveEntidad) y de categorías (por clave)."""
+    poblacion = leer_dimension(os.path.join(directorio, "dataPoblacion.xlsx"), "claveEntidad")
+    categorias = leer_dimension(
+        os.path.join(directorio, conjunto.categorias), "clave",
+        encoding=conjunto.codificacion_categorias,
+    )
+    return poblacion, categorias
+
+
+def ruta_cruda(conjunto, anio, directorio):
+    return os.path.join(directorio, f"{conjunto.nombre}{anio}.csv")
+
+
+def opciones_lectura(conjunto, ruta):
+    """Argumentos de read_csv para un archivo crudo: proyección y tipos.
+
+    Las columnas que la limpieza descarta no se leen. Las de `conjunto.tipos`
+    se convierten al leer (los blancos quedan como nulos); el resto se lee
+    como texto para conservar los identificadores tal cual.
+    """
+    encabezado = pd.read_csv(ruta, nrows=0).columns
+    descartadas = set(conjunto.columnas_eliminar)
+    columnas = [c for c in encabezado if c not in descartadas]
+    numericas = [c for c in columnas if c in conjunto.tipos]
+    return {
+        "usecols": columnas,
+        "dtype": {c: conjunto.tipos.get(c, str) for c in columnas},
+        "na_values": {c: [BLANCO] for c in numericas},
+    }
+
+
+def filas_por_bloque(crudo, procesado, memoria):
+    """Filas por bloque para que procesar un bloque quepa en `memoria` bytes.
+
+    `crudo` y `procesado` son una muestra del archivo recién leída y la misma
+    muestra ya transformada y unida; de ellas salen los bytes por fila. El
+    bloque unido se cuenta FACTOR_MEMORIA_BLOQUE veces por las copias
+    intermedias.
+    """
+    if crudo.empty or procesado.empty:
+        return TAMANIO_BLOQUE
+    por_fila = (
+        crudo.memory_usage(deep=True).sum() / len(crudo)
+        + procesado.memory_usage(deep=True).sum() / len(procesado) * FACTOR_MEMORIA_BLOQUE
+    )
+    return max(1_000, int(memoria / por_fila))
+
+
+def procesar_anio(conjunto, anio, directorio, poblacion, categorias, tamanio_bloque=TAMANIO_BLOQUE,
+                  memoria=None):
+    """Genera los bloques ya transformados y unidos de un año.
+
+    Con `memoria` (bytes) el tamaño de bloque se calcula con filas_por_bloque
+    en lugar de usar `tamanio_bloque`.
+    """
+    def preparar(bloque):
+        bloque = transformar(bloque, conjunto, anio)
+        return categorias.unir(poblacion.unir(bloque))
+
+    ruta = ruta_cruda(conjunto, anio, directorio)
+    opciones = opciones_lectura(conjunto, ruta)
+    if memoria:
+        muestra = pd.read_csv(ruta, nrows=FILAS_MUESTRA, **opciones)
+        tamanio_bloque = filas_por_bloque(muestra, preparar(muestra.copy()), memoria)
+    for bloque in pd.read_csv(ruta, chunksize=tamanio_bloque, **opciones):
+        yield preparar(bloque)
+
+
+def _eliminar(ruta):
+    if os.path.isdir(ruta):
+        shutil.rmtree(ruta)
+    elif os.path.exists(ruta):
+        os.remove(ruta)
+
+
+class Escritor:
+    """Anexa bloques a un CSV y al dataset Parquet de un conjunto.
+
+    `ruta_dataset` es la ruta del CSV unificado cuyo dataset Parquet recibe
+    los bloques; por defecto es la misma `ruta`. Las columnas `etiquetas`
+    (atributos de las dimensiones) van al dataset pero no al CSV.
+    """
+
+    def __init__(self, ruta, medida, ruta_dataset=None, etiquetas=()):
+        self.ruta = ruta
+        self.medida = medida
+        self.ruta_dataset = ruta_dataset or ruta
+        self.etiquetas = set(etiquetas)
+        self.columnas = None
+        self.filas = 0
+        self.bloques = 0
+        _eliminar(self.ruta)
+
+    def escribir(self, bloque):
+        primero = self.columnas is None
+        if primero:
+            self.columnas = list(bloque.columns)
+        bloque = bloque.reindex(columns=self.columnas)
+        bloque.drop(columns=[c for c in self.columnas if c in self.etiquetas]).to_csv(
+            self.ruta, mode="a", header=primero, index=False, encoding="utf-8"
+        )
+        exportar_parquet(bloque, self.ruta_dataset, self.medida, anexar=True, bloque=self.bloques)
+        self.filas += len(bloque)
+        self.bloques += 1
+
+
+DIRECTORIO_PARTES = "partes_etl"
+
+
+def ruta_parte(conjunto, anio, directorio_salida):
+    """CSV intermedio con el resultado de un año de un conjunto."""
+    return os.path.join(directorio_salida, DIRECTORIO_PARTES, f"{conjunto.nombre}{anio}.csv")
+
+
+def ruta_particion(conjunto, anio, directorio_salida):
+    """Directorio anio=<anio> del dataset Parquet de un conjunto."""
+    dataset = ruta_parquet(os.path.join(directorio_salida, conjunto.salida))
+    return os.path.join(dataset, f"anio={anio}")
+
+
+def procesar_parte(nombre, anio, directorio_datos, directorio_salida, tamanio_bloque=TAMANIO_BLOQUE,
+                   memoria=None):
+    """Tarea independiente: un año de un conjunto.
+
+    Escribe el CSV intermedio del año y reescribe las particiones anio=<anio>
+    del dataset Parquet (ningún otro año escribe en ellas). Regresa
+    (ruta de la parte, filas).
+    """
+    conjunto = CONJUNTOS[nombre]
+    poblacion, categorias = leer_dimensiones(conjunto, directorio_datos)
+    parte = ruta_parte(conjunto, anio, directorio_salida)
+    os.makedirs(os.path.dirname(parte), exist_ok=True)
+    _eliminar(ruta_particion(conjunto, anio, directorio_salida))
+    escritor = Escritor(
+        parte, conjunto.medida, os.path.join(directorio_salida, conjunto.salida),
+        etiquetas=poblacion.columnas + categorias.columnas,
+    )
+    for bloque in procesar_anio(
+        conjunto, anio, directorio_datos, poblacion, categorias, tamanio_bloque, memoria
+    ):
+        escritor.escribir(bloque)
+    return parte, escritor.filas
+
+
+def escribir_dimensiones(conjunto, directorio_datos, destino):
+    """Escribe junto al CSV unificado `destino` las dimensiones con que se unió."""
+    poblacion, categorias = leer_dimensiones(conjunto, directorio_datos)
+    for nombre, dimension in (("entidades", poblacion), ("categorias", categorias)):
+        dimension.tabla().to_csv(ruta_dimension(destino, nombre), index=False, encoding="utf-8")
+
+
+def unir_partes(partes, destino, anexar=False):
+    """Concatena los CSV intermedios en `destino`, en el orden dado.
+
+    Las partes con el mismo encabezado se copian byte a byte; si una parte
+    trae las columnas en otro orden se reordena por bloques. Con `anexar`
+    las partes se agregan al final de un `destino` existente.
+    """
+    columnas = None
+    if anexar:
+        with open(destino, "rb") as existente:
+            columnas = existente.readline()
+    with open(destino, "ab" if anexar else "wb") as salida:
+        for parte in partes:
+            if not os.path.exists(parte):
+                continue
+            with open(parte, "rb") as entrada:
+                encabezado = entrada.readline()
+                if columnas is None:
+                    columnas = encabezado
+                    salida.write(encabezado)
+                if encabezado == columnas:
+                    shutil.copyfileobj(entrada, salida, 16 * 2**20)
+                    continue
+            orden = columnas.decode("utf-8").rstrip("\r\n").split(",")
+            for bloque in pd.read_csv(parte, chunksize=TAMANIO_BLOQUE, dtype=str):
+                bloque.reindex(columns=orden).to_csv(salida, header=False, index=False)
+
+
+# --- Manifiesto de ejecuciones incrementales ---
+
+# Cambiar al modificar la transformación; invalida todas las partes guardadas
+VERSION_ETL = 4
+
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+
+
+def _ruta_manifiesto(directorio_salida):
+    return os.path.join(directorio_salida, DIRECTORIO_PARTES, ARCHIVO_MANIFIESTO)
+
+
+def leer_manifiesto(directorio_salida):
+    try:
+        with open(_ruta_manifiesto(directorio_salida), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": VERSION_ETL, "huellas": {}, "partes": {}, "unificados": {}}
+
+
+def guardar_manifiesto(manifiesto, directorio_salida):
+    ruta = _ruta_manifiesto(directorio_salida)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=1, sort_keys=True)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def huella(ruta, huellas):
+    """SHA-256 del archivo. Se recalcula solo si cambiaron su tamaño o mtime.
+
+    `huellas` es la caché {ruta: {tamanio, mtime, sha256}} del manifiesto y
+    se actualiza en el lugar.
+    """
+    info = os.stat(ruta)
+    previa = huellas.get(ruta)
+    if previa and previa["tamanio"] == info.st_size and previa["mtime"] == info.st_mtime_ns:
+        return previa["sha256"]
+    resumen = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for pedazo in iter(lambda: f.read(16 * 2**20), b""):
+            resumen.update(pedazo)
+    huellas[ruta] = {"tamanio": info.st_size, "mtime": info.st_mtime_ns, "sha256": resumen.hexdigest()}
+    return huellas[ruta]["sha256"]
+
+
+def entradas_parte(conjunto, anio, directorio_datos, huellas):
+    """Huellas de todo lo que determina la parte de un año."""
+    archivos = [f"{conjunto.nombre}{anio}.csv", "dataPoblacion.xlsx", conjunto.categorias]
+    entradas = {a: huella(os.path.join(directorio_datos, a), huellas) for a in archivos}
+    entradas["version"] = VERSION_ETL
+    return entradas
+
+
+def _parte_vigente(manifiesto, clave, entradas, conjunto, anio, directorio_salida):
+    registro = manifiesto["partes"].get(clave)
+    return (
+        registro is not None
+        and registro["entradas"] == entradas
+        and os.path.exists(ruta_parte(conjunto, anio, directorio_salida))
+        and (registro["filas"] == 0 or os.path.isdir(ruta_particion(conjunto, anio, directorio_salida)))
+    )
+
+
+def construir(conjuntos=("gastos", "ingresos"), directorio_datos=".", directorio_salida=".",
+              anios=ANIOS, tamanio_bloque=TAMANIO_BLOQUE, trabajadores=None, completo=False,
+              memoria=None):
+    """Construye los archivos unificados de `conjuntos` de forma incremental.
+
+    Cada (conjunto, año) es una tarea independiente cuyo resultado se guarda
+    en partes_etl/ junto con las huellas de sus entradas (archivo crudo,
+    población, catálogo y VERSION_ETL). Solo se recalculan las tareas cuyas
+    entradas cambiaron (todas con `completo`); con `trabajadores` > 1 se
+    reparten en un pool de procesos. Las particiones Parquet de los años sin
+    cambios no se tocan, y el CSV unificado se reescribe concatenando las
+    partes en orden de año, o solo se le anexan los años nuevos cuando los
+    anteriores no cambiaron. `memoria` (bytes) es el presupuesto total; se
+    reparte entre los trabajadores y define el tamaño de sus bloques.
+    Regresa {conjunto: filas}.
+    """
+    manifiesto = leer_manifiesto(directorio_salida)
+    if completo or manifiesto.get("version") != VERSION_ETL:
+        manifiesto = {"version": VERSION_ETL, "huellas": {}, "partes": {}, "unificados": {}}
+        for nombre in conjuntos:
+            _eliminar(ruta_parquet(os.path.join(directorio_salida, CONJUNTOS[nombre].salida)))
+
+    tareas, entradas = [], {}
+    for nombre in conjuntos:
+        for anio in anios:
+            clave = f"{nombre}:{anio}"
+            entradas[clave] = entradas_parte(CONJUNTOS[nombre], anio, directorio_datos, manifiesto["huellas"])
+            if not _parte_vigente(manifiesto, clave, entradas[clave], CONJUNTOS[nombre], anio, directorio_salida):
+                tareas.append((nombre, anio))
+
+    if trabajadores is None:
+        trabajadores = min(len(tareas), os.cpu_count() or 1)
+    memoria_trabajador = memoria // max(trabajadores, 1) if memoria else None
+    argumentos = [
+        (n, a, directorio_datos, directorio_salida, tamanio_bloque, memoria_trabajador)
+        for n, a in tareas
+    ]
+    if trabajadores > 1:
+        with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+            resultados = list(pool.map(procesar_parte, *zip(*argumentos)))
+    else:
+        resultados = [procesar_parte(*a) for a in argumentos]
+
+    for (nombre, anio), (_, filas_parte) in zip(tareas, resultados):
+        clave = f"{nombre}:{anio}"
+        manifiesto["partes"][clave] = {"entradas": entradas[clave], "filas": filas_parte}
+        logger.info("%s: procesado (%d filas)", clave, filas_parte)
+    guardar_manifiesto(manifiesto, directorio_salida)
+
+    filas = {}
+    for nombre in conjuntos:
+        conjunto = CONJUNTOS[nombre]
+        destino = os.path.join(directorio_salida, conjunto.salida)
+        claves = [f"{nombre}:{anio}" for anio in anios]
+        composicion = [[c, manifiesto["partes"][c]["entradas"]] for c in claves]
+        previa = manifiesto["unificados"].get(nombre)
+
+        # Particiones de años que ya no forman parte de la salida
+        dataset = ruta_parquet(destino)
+        if os.path.isdir(dataset):
+            for particion in os.listdir(dataset):
+                if particion.startswith("anio=") and int(particion[5:]) not in anios:
+                    _eliminar(os.path.join(dataset, particion))
+
+        if previa == composicion and os.path.exists(destino):
+            pass
+        elif previa and os.path.exists(destino) and composicion[:len(previa)] == previa:
+            nuevas = [ruta_parte(conjunto, int(c.split(":")[1]), directorio_salida)
+                      for c, _ in composicion[len(previa):]]
+            unir_partes(nuevas, destino, anexar=True)
+        else:
+            partes = [ruta_parte(conjunto, anio, directorio_salida) for anio in anios]
+            unir_partes(partes, destino)
+        escribir_dimensiones(conjunto, directorio_datos, destino)
+        manifiesto["unificados"][nombre] = composicion
+        guardar_manifiesto(manifiesto, directorio_salida)
+        filas[nombre] = sum(manifiesto["partes"][c]["filas"] for c in claves)
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ETL de la ENIGH para el dashboard")
+    parser.add_argument("--datos", default=".", help="directorio con los CSV crudos y catálogos")
+    parser.add_argument("--salida", default=".", help="directorio de los archivos unificados")
+    parser.add_argument("--anios", type=int, nargs="+", default=ANIOS)
+    parser.add_argument("--conjuntos", nargs="+", choices=list(CONJUNTOS), default=list(CONJUNTOS))
+    parser.add_argument("--tamanio-bloque", type=int, default=TAMANIO_BLOQUE)
+    parser.add_argument(
+        "--memoria-mb", type=int, default=None,
+        help="presupuesto de memoria de todo el ETL; si se da, define el tamaño de bloque",
+    )
+    parser.add_argument(
+        "--trabajadores", type=int, default=None,
+        help="procesos en paralelo (por defecto uno por tarea pendiente, hasta el número de CPUs)",
+    )
+    parser.add_argument(
+        "--completo", action="store_true",
+        help="ignora las partes guardadas y reconstruye todo",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    inicio = time.perf_counter()
+    filas = construir(
+        args.conjuntos, args.datos, args.salida, args.anios, args.tamanio_bloque,
+        args.trabajadores, args.completo,
+        args.memoria_mb * 2**20 if args.memoria_mb else None,
+    )
+    for nombre, total in filas.items():
+        print(f"{CONJUNTOS[nombre].salida}: {total} filas")
+    print(f"ETL terminado en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
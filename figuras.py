@@ -0,0 +1,88 @@
+"""Caché de figuras de Plotly ya construidas.
+
+Construir una figura con Plotly Express cuesta mucho más que calcular los
+agregados que dibuja. `figura` identifica cada gráfica por una huella de la
+función que la construye, sus datos y sus parámetros, y guarda la figura en
+una caché LRU acotada por memoria compartida por todas las sesiones del
+proceso. Si nada cambió, un rerun entrega la misma go.Figure.
+
+Se guarda la figura y no su JSON porque st.plotly_chart vuelve a validar
+cualquier dict con go.Figure(**spec) antes de serializarlo; con una
+go.Figure solo la copia con to_dict y la serializa una vez.
+"""
+import dataclasses
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from memo import CacheLRU
+from perezoso import ModuloPerezoso
+from trazas import tramo
+
+pio = ModuloPerezoso("plotly.io")
+
+MAX_FIGURAS = 256
+MAX_BYTES_FIGURAS = 64 * 2**20
+
+
+def tamanio_figura(fig):
+    """Bytes aproximados de una figura: los de su JSON."""
+    return len(pio.to_json(fig, validate=False))
+
+
+cache = CacheLRU(max_entradas=MAX_FIGURAS, max_bytes=MAX_BYTES_FIGURAS, medir=tamanio_figura)
+
+
+def _actualizar(h, valor):
+    """Agrega `valor` a la huella `h`; los datos tabulares se hashean por contenido."""
+    h.update(type(valor).__name__.encode())
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        if isinstance(valor, pd.DataFrame):
+            h.update(repr((list(valor.columns), list(valor.dtypes))).encode())
+        else:
+            h.update(repr((valor.name, valor.dtype)).encode())
+        h.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+    elif isinstance(valor, np.ndarray):
+        h.update(f"{valor.dtype}{valor.shape}".encode())
+        h.update(np.ascontiguousarray(valor).tobytes())
+    elif isinstance(valor, dict):
+        for clave in sorted(valor, key=repr):
+            _actualizar(h, clave)
+            _actualizar(h, valor[clave])
+    elif isinstance(valor, (list, tuple)):
+        h.update(str(len(valor)).encode())
+        for elemento in valor:
+            _actualizar(h, elemento)
+    elif dataclasses.is_dataclass(valor) and not isinstance(valor, type):
+        _actualizar(h, {c.name: getattr(valor, c.name) for c in dataclasses.fields(valor)})
+    else:
+        h.update(repr(valor).encode())
+
+
+def huella(*partes):
+    """Hash estable del contenido de `partes`."""
+    h = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        _actualizar(h, parte)
+    return h.hexdigest()
+
+
+def figura(construir, *args, **parametros):
+    """La figura `construir(*args, **parametros)` (una go.Figure).
+
+    Se sirve de la caché mientras la función, los datos y los parámetros sean
+    los mismos; si no, se construye una vez. El resultado se comparte entre
+    sesiones: se pasa directo a st.plotly_chart y no debe modificarse.
+    """
+    with tramo("figura", etiqueta=construir.__qualname__) as t:
+        clave = huella(construir.__module__, construir.__qualname__, args, parametros)
+
+        def construida():
+            with tramo("construir_figura"):
+                fig = construir(*args, **parametros)
+            t.registrar(en_cache=False)
+            return fig
+
+        t.registrar(en_cache=True)
+        return cache.obtener_o_calcular(clave, construida)
@@ -0,0 +1,93 @@
+"""Coordenadas de las entidades para los mapas.
+
+`mexico.json` se lee una sola vez por proceso (se vuelve a leer sólo si
+cambia) y se guarda como arreglos de latitud y longitud. Para cada
+diccionario de entidades de los cubos se calcula, también una sola vez, la
+posición de cada estado en el diccionario; así los totales por entidad que
+ya sirve la caché de consultas se convierten en los arreglos del mapa con un
+`take`, sin merges.
+"""
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import firma_archivo
+
+# Diccionarios de entidades distintos cuya alineación se conserva
+MAX_ALINEACIONES = 8
+
+
+class Coordenadas:
+    """Estados de `mexico.json` con su latitud y longitud."""
+
+    def __init__(self, estados, latitud, longitud, firma=None):
+        self.estados = pd.Index(estados, dtype=str)
+        self.latitud = np.asarray(latitud, dtype="float64")
+        self.longitud = np.asarray(longitud, dtype="float64")
+        self.firma = firma
+        # id(diccionario) -> (diccionario, posición de cada estado en él)
+        self._alineaciones = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.estados)
+
+    def posiciones(self, diccionario):
+        """Posición de cada estado en `diccionario` de entidades (-1 si no está)."""
+        with self._lock:
+            entrada = self._alineaciones.get(id(diccionario))
+            if entrada is None or entrada[0] is not diccionario:
+                posiciones = pd.Index(diccionario).astype(str).get_indexer(self.estados)
+                if len(self._alineaciones) >= MAX_ALINEACIONES:
+                    self._alineaciones.clear()
+                entrada = self._alineaciones[id(diccionario)] = (diccionario, posiciones)
+        return entrada[1]
+
+    def valores(self, totales, medida, entidad="nombreEntidad2"):
+        """Total de cada estado (0 si no hay datos) a partir de una suma por entidad.
+
+        `totales` es una suma por `entidad` como las que regresa
+        cubos.consultar; `entidad` debe ser categórica.
+        """
+        categorias = totales[entidad].cat
+        por_codigo = np.zeros(len(categorias.categories) + 1)
+        # El código -1 (nulo) cae en la posición extra y no se lee
+        por_codigo[categorias.codes.to_numpy()] = totales[medida].to_numpy(dtype="float64")
+        posiciones = self.posiciones(categorias.categories)
+        return np.where(posiciones >= 0, por_codigo[posiciones], 0.0)
+
+    def tabla(self, **columnas):
+        """DataFrame Estado, Latitud, Longitud y las `columnas` dadas (arreglos alineados)."""
+        return pd.DataFrame({
+            "Estado": self.estados,
+            "Latitud": self.latitud,
+            "Longitud": self.longitud,
+            **columnas,
+        })
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def cargar_coordenadas(ruta="mexico.json"):
+    """Coordenadas de `ruta`, cacheadas mientras el archivo no cambie."""
+    firma = firma_archivo(ruta)
+    with _lock:
+        coordenadas = _cache.get(firma[0])
+    if coordenadas is not None and coordenadas.firma == firma:
+        return coordenadas
+
+    with open(ruta, "r", encoding="utf-8") as f:
+        datos = json.load(f)
+    coordenadas = Coordenadas(
+        [item["label"] for item in datos],
+        [item["lat"] for item in datos],
+        [item["lng"] for item in datos],
+        firma=firma,
+    )
+    with _lock:
+        _cache[firma[0]] = coordenadas
+    return coordenadas
@@ -0,0 +1,312 @@
+"""Tabla de hechos compacta con dimensiones codificadas por diccionario.
+
+Cada dimensión (anio, region, nombreEntidad2, categoria, descripcion, ...) se
+guarda como un arreglo de códigos int8/int16 que apunta a un diccionario de
+valores; las medidas se guardan como float32. Los diccionarios se comparten
+entre tablas: gastos e ingresos usan el mismo objeto para nombreEntidad2 o
+region. Por fila se ocupan unos pocos bytes en lugar de una cadena por
+columna.
+
+Los filtros se resuelven con una tabla booleana indexada por código y las
+sumas agrupadas con np.bincount sobre la clave combinada de los códigos, sin
+pasar por un DataFrame; `a_dataframe` reconstruye uno (con categóricas que
+reutilizan los diccionarios) cuando hace falta. Las sumas ponderadas por el
+factor de expansión y los errores estándar del diseño muestral (`estimar`)
+reutilizan la misma clave: cada una es una pasada más de np.bincount.
+"""
+import os
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import COLUMNAS_ENTERAS, firma_archivo, fuente_datos, leer_csv, leer_parquet
+
+# Grupos posibles a partir de los cuales `_compactar` usa np.unique en lugar
+# de una tabla densa (que además no pasa de unas cuantas veces las filas)
+MAX_GRUPOS_DENSOS = 2**24
+
+# Sufijo de las sumas ponderadas por el factor de expansión en `sumar`
+SUFIJO_PONDERADO = "_ponderado"
+
+# {columna: [diccionarios]}; una tabla reutiliza el primero que contenga todos sus valores
+_diccionarios = {}
+_lock = threading.Lock()
+
+
+def diccionario(columna, valores):
+    """Diccionario compartido de `columna` que contiene todos los `valores`.
+
+    Un diccionario nuevo conserva el orden de `valores` (el de las categorías
+    de origen), así las sumas salen en el mismo orden que con groupby.
+    """
+    valores = pd.Index(valores).dropna().unique()
+    with _lock:
+        for existente in _diccionarios.setdefault(columna, []):
+            if existente.dtype == valores.dtype and valores.isin(existente).all():
+                return existente
+        _diccionarios[columna].append(valores)
+    return valores
+
+
+def tipo_codigos(tamanio):
+    """Entero más pequeño que guarda códigos 0..tamanio-1 y el -1 de nulo."""
+    for tipo in (np.int8, np.int16, np.int32):
+        if tamanio <= np.iinfo(tipo).max:
+            return tipo
+    return np.int64
+
+
+def codificar(serie, columna):
+    """(códigos, diccionario compartido) de una columna; -1 marca nulos."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        locales = serie.cat.codes.to_numpy()
+        categorias = serie.cat.categories
+    else:
+        locales, categorias = pd.factorize(serie, sort=True)
+    dic = diccionario(columna, categorias)
+    # código local -> código del diccionario; el -1 cae en la última posición
+    mapa = np.append(dic.get_indexer(categorias), -1)
+    return mapa.take(locales).astype(tipo_codigos(len(dic))), dic
+
+
+def _compactar(clave, total):
+    """(claves presentes en orden, posición de cada elemento de `clave` en ellas).
+
+    Con pocas claves posibles se usa una tabla densa; si no, np.unique.
+    """
+    if total <= MAX_GRUPOS_DENSOS and total <= 4 * len(clave) + 1024:
+        presentes = np.flatnonzero(np.bincount(clave, minlength=total))
+        posicion = np.zeros(total, dtype=np.int64)
+        posicion[presentes] = np.arange(len(presentes))
+        return presentes, posicion[clave]
+    return np.unique(clave, return_inverse=True)
+
+
+@dataclass
+class TablaHechos:
+    filas: int
+    dimensiones: dict = field(default_factory=dict)  # columna -> (códigos, diccionario)
+    medidas: dict = field(default_factory=dict)  # columna -> float32
+    # {(estratos, upm): unidades primarias de muestreo}; ver `unidades`
+    _unidades: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @classmethod
+    def desde_dataframe(cls, df, medidas=None):
+        """Convierte `df`; por defecto las columnas flotantes son las medidas."""
+        if medidas is None:
+            medidas = [c for c in df.columns if pd.api.types.is_float_dtype(df[c])]
+        return cls(
+            filas=len(df),
+            dimensiones={c: codificar(df[c], c) for c in df.columns if c not in medidas},
+            medidas={m: df[m].to_numpy(dtype="float32") for m in medidas},
+        )
+
+    @property
+    def columnas(self):
+        return list(self.dimensiones) + list(self.medidas)
+
+    def valores(self, columna, codigos=None):
+        """Columna decodificada (categórica, o entera para anio/claveEntidad)."""
+        propios, dic = self.dimensiones[columna]
+        codigos = propios if codigos is None else codigos
+        if columna in COLUMNAS_ENTERAS or pd.api.types.is_integer_dtype(dic):
+            tipo = COLUMNAS_ENTERAS.get(columna, dic.dtype)
+            return dic.to_numpy().take(codigos).astype(tipo)
+        return pd.Categorical.from_codes(codigos, dtype=pd.CategoricalDtype(dic))
+
+    def a_dataframe(self, columnas=None):
+        columnas = self.columnas if columnas is None else columnas
+        return pd.DataFrame({
+            c: self.medidas[c] if c in self.medidas else self.valores(c) for c in columnas
+        })
+
+    def mascara(self, **filtros):
+        """Filas cuyo valor de cada columna está en los valores dados.
+
+        `filtros` es {columna: valor o lista de valores}; None no filtra.
+        """
+        mascara = np.ones(self.filas, dtype=bool)
+        for columna, valores in filtros.items():
+            if valores is None:
+                continue
+            if np.ndim(valores) == 0:
+                valores = [valores]
+            codigos, dic = self.dimensiones[columna]
+            # Una posición extra para que el código -1 (nulo) nunca se seleccione
+            seleccion = np.zeros(len(dic) + 1, dtype=bool)
+            posiciones = dic.get_indexer(pd.Index(list(valores)).astype(dic.dtype, copy=False))
+            seleccion[posiciones[posiciones >= 0]] = True
+            mascara &= seleccion[codigos]
+        return mascara
+
+    def filtrar(self, mascara):
+        return TablaHechos(
+            filas=int(mascara.sum()),
+            dimensiones={c: (codigos[mascara], dic) for c, (codigos, dic) in self.dimensiones.items()},
+            medidas={m: valores[mascara] for m, valores in self.medidas.items()},
+        )
+
+    def _clave(self, por, mascara=None):
+        """(filas válidas, clave combinada de los códigos de `por`, tamaños de sus diccionarios)."""
+        tamanios = [len(self.dimensiones[c][1]) for c in por]
+        validas = np.ones(self.filas, dtype=bool) if mascara is None else mascara.copy()
+        clave = np.zeros(self.filas, dtype=np.int64)
+        for columna, tamanio in zip(por, tamanios):
+            codigos = self.dimensiones[columna][0]
+            validas &= codigos >= 0
+            clave = clave * tamanio + codigos
+        return validas, clave, tamanios
+
+    def pesos(self, columna):
+        """Columna de pesos en float64; los nulos (filas sin diseño) valen 0."""
+        peso = self.medidas[columna].astype("float64")
+        peso[~(peso > 0)] = 0
+        return peso
+
+    def sumar(self, por, medidas, mascara=None, pesos=None):
+        """Suma de `medidas` por las columnas `por` (como groupby(observed=True).sum()).
+
+        Las sumas se acumulan en float64. Las filas con nulo en alguna columna
+        de `por` o fuera de `mascara` no cuentan. Con `pesos` (el factor de
+        expansión) se agregan, con la misma clave, la suma de cada medida por
+        el peso (`medida` + SUFIJO_PONDERADO) y la de los pesos (`pesos`).
+        """
+        por = [por] if isinstance(por, str) else list(por)
+        medidas = [medidas] if isinstance(medidas, str) else list(medidas)
+        validas, clave, tamanios = self._clave(por, mascara)
+        clave = clave[validas]
+
+        # Cada medida se acumula en un arreglo del tamaño de los grupos presentes
+        presentes, indice = _compactar(clave, int(np.prod(tamanios, dtype=np.int64)))
+        grupos = len(presentes)
+
+        def acumular(valores):
+            return np.bincount(indice, weights=valores, minlength=grupos)
+
+        peso = None if pesos is None else self.pesos(pesos)[validas]
+        sumas = {}
+        for medida in medidas:
+            valores = self.medidas[medida][validas].astype("float64")
+            sumas[medida] = acumular(valores)
+            if peso is not None:
+                sumas[medida + SUFIJO_PONDERADO] = acumular(valores * peso)
+        if peso is not None:
+            sumas[pesos] = acumular(peso)
+
+        codigos_grupo = np.unravel_index(presentes, tamanios) if por else []
+        resultado = {c: self.valores(c, codigos) for c, codigos in zip(por, codigos_grupo)}
+        resultado.update(sumas)
+        return pd.DataFrame(resultado)
+
+    def unidades(self, estratos, upm):
+        """Unidades primarias de muestreo (UPM) de la tabla; se calculan una vez.
+
+        Una UPM es una combinación de `estratos` y `upm` (con "anio" entre
+        los estratos, los levantamientos de años distintos no se mezclan).
+        Regresa (UPM de cada fila o -1 sin diseño, estrato de cada UPM,
+        número de UPMs de cada estrato).
+        """
+        llave = (tuple(estratos), upm)
+        if llave not in self._unidades:
+            validas, clave, tamanios = self._clave(list(estratos) + [upm])
+            claves, unidad = np.unique(clave[validas], return_inverse=True)
+            de_fila = np.full(self.filas, -1, dtype=np.int32)
+            de_fila[validas] = unidad
+            _, estrato = np.unique(claves // tamanios[-1], return_inverse=True)
+            self._unidades[llave] = (de_fila, estrato, np.bincount(estrato))
+        return self._unidades[llave]
+
+    def estimar(self, por, medidas, pesos="factor", estratos=("anio", "est_dis"), upm="upm", mascara=None):
+        """Totales ponderados de `medidas` por `por` con su error estándar de diseño.
+
+        La varianza es la de conglomerados últimos que usa el INEGI para la
+        ENIGH. Con z_ghi la suma de peso·medida del grupo g en la UPM i del
+        estrato h, que tiene n_h UPMs en la muestra:
+
+            V(Y_g) = sum_h n_h / (n_h - 1) * sum_i (z_ghi - media_i z_ghi)^2
+
+        Las UPMs del estrato sin filas del grupo cuentan con z = 0
+        (estimación por dominio) y los estratos con una sola UPM no aportan.
+        Cada medida es una pasada de np.bincount sobre las filas, a (grupo,
+        UPM); el resto se reduce sobre esas sumas. Solo cuentan las filas con
+        diseño y peso positivo.
+
+        Regresa `por`, `medida` (total), `medida`_ee y `upm` (UPMs con datos).
+        """
+        por = [por] if isinstance(por, str) else list(por)
+        medidas = [medidas] if isinstance(medidas, str) else list(medidas)
+        unidad, estrato, por_estrato = self.unidades(estratos, upm)
+        validas, clave, tamanios = self._clave(por, mascara)
+        peso = self.pesos(pesos)
+        validas &= (unidad >= 0) & (peso > 0)
+        peso = peso[validas]
+
+        total_grupos = int(np.prod(tamanios, dtype=np.int64))
+        claves_grupo, grupo = _compactar(clave[validas], total_grupos)
+        unidades = len(estrato)
+        # Una celda por (grupo, UPM) con filas; su grupo y el estrato de su UPM
+        celdas, celda = _compactar(grupo * unidades + unidad[validas], len(claves_grupo) * unidades)
+        grupo_celda = celdas // unidades
+        estrato_celda = estrato[celdas % unidades]
+        estratos_n = len(por_estrato)
+        pares, par = _compactar(grupo_celda * estratos_n + estrato_celda, len(claves_grupo) * estratos_n)
+        grupo_par = pares // estratos_n
+        n = por_estrato[pares % estratos_n].astype("float64")
+        factor = np.divide(n, n - 1, out=np.zeros_like(n), where=n > 1)
+
+        grupos = len(claves_grupo)
+        codigos_grupo = np.unravel_index(claves_grupo, tamanios) if por else []
+        resultado = {c: self.valores(c, codigos) for c, codigos in zip(por, codigos_grupo)}
+        for medida in medidas:
+            z = np.bincount(celda, weights=self.medidas[medida][validas] * peso, minlength=len(celdas))
+            s1 = np.bincount(par, weights=z, minlength=len(pares))
+            s2 = np.bincount(par, weights=z * z, minlength=len(pares))
+            termino = factor * np.maximum(s2 - s1 * s1 / np.maximum(n, 1), 0)
+            resultado[medida] = np.bincount(grupo_celda, weights=z, minlength=grupos)
+            resultado[medida + "_ee"] = np.sqrt(np.bincount(grupo_par, weights=termino, minlength=grupos))
+        resultado["upm"] = np.bincount(grupo_celda, minlength=grupos)
+        return pd.DataFrame(resultado)
+
+    def memoria(self):
+        """Bytes de los códigos y las medidas (los diccionarios son compartidos)."""
+        return sum(c.nbytes for c, _ in self.dimensiones.values()) + sum(
+            m.nbytes for m in self.medidas.values()
+        )
+
+
+_cache = {}
+_lock_cache = threading.Lock()
+
+
+def cargar_hechos(ruta, medida, columnas=None, compartidas=True):
+    """Tabla de hechos de un archivo unificado, cacheada mientras no cambie.
+
+    Si hay columnas compartidas vigentes (compartido.py) se mapean sin leer
+    nada; si no, se lee el dataset Parquet si existe (si no, el CSV) con
+    carga_datos y se convierte; el DataFrame intermedio no se conserva.
+    """
+    # Import diferido: compartido.py usa este módulo
+    from compartido import adjuntar_vigente
+
+    fuente = fuente_datos(ruta)
+    firma = firma_archivo(fuente)
+    clave = (firma[0], tuple(columnas) if columnas else None, compartidas)
+    with _lock_cache:
+        entrada = _cache.get(clave)
+    if entrada is not None and entrada[0] == firma:
+        return entrada[1]
+
+    tabla = adjuntar_vigente(ruta, columnas) if compartidas else None
+    if tabla is None:
+        lector = leer_parquet if os.path.isdir(fuente) else leer_csv
+        tabla = TablaHechos.desde_dataframe(lector(fuente, medida, columnas))
+    with _lock_cache:
+        _cache[clave] = (firma, tabla)
+    return tabla
+
+
+def limpiar_cache():
+    with _lock_cache:
+        _cache.clear()
@@ -0,0 +1,79 @@
+"""Caché LRU acotada por número de entradas y por memoria."""
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def tamanio_bytes(valor):
+    """Memoria aproximada que ocupa `valor` (DataFrames incluidos)."""
+    if isinstance(valor, (pd.DataFrame, pd.Series, pd.Index)):
+        uso = valor.memory_usage(deep=True)
+        return int(uso.sum()) if hasattr(uso, "sum") else int(uso)
+    if isinstance(valor, (list, tuple, set)):
+        return sys.getsizeof(valor) + sum(tamanio_bytes(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanio_bytes(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    """Diccionario LRU con límite de entradas y de bytes.
+
+    Al insertar se desalojan las entradas menos usadas hasta cumplir ambos
+    límites. Un valor más grande que `max_bytes` no se guarda. Los valores se
+    comparten entre llamadas, así que no deben modificarse. `medir` calcula
+    los bytes de un valor (tamanio_bytes por defecto).
+    """
+
+    def __init__(self, max_entradas=128, max_bytes=64 * 2**20, medir=tamanio_bytes):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.medir = medir
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def __contains__(self, clave):
+        return clave in self._datos
+
+    def obtener(self, clave, defecto=None):
+        with self._lock:
+            if clave not in self._datos:
+                self.fallos += 1
+                return defecto
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return self._datos[clave][0]
+
+    def guardar(self, clave, valor):
+        tamanio = self.medir(valor)
+        if tamanio > self.max_bytes:
+            return valor
+        with self._lock:
+            if clave in self._datos:
+                self.bytes -= self._datos.pop(clave)[1]
+            self._datos[clave] = (valor, tamanio)
+            self.bytes += tamanio
+            while len(self._datos) > self.max_entradas or self.bytes > self.max_bytes:
+                _, (_, liberado) = self._datos.popitem(last=False)
+                self.bytes -= liberado
+        return valor
+
+    def obtener_o_calcular(self, clave, calcular):
+        faltante = object()
+        valor = self.obtener(clave, faltante)
+        if valor is faltante:
+            valor = self.guardar(clave, calcular())
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self.bytes = 0
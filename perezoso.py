@@ -0,0 +1,38 @@
+"""Importación diferida de bibliotecas pesadas.
+
+El dashboard sólo necesita Streamlit, pandas y los cubos para mostrar el
+título, la barra lateral y las pestañas. Las bibliotecas de gráficas se
+importan la primera vez que un panel las usa, así el primer contenido de una
+sesión nueva llega antes después de un reinicio. `benchmark.py --importacion`
+reporta cuánto cuesta cada importación.
+"""
+import importlib
+import threading
+
+
+class ModuloPerezoso:
+    """Se comporta como el módulo `nombre`, que se importa al primer acceso."""
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+        self._modulo = None
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        if self._modulo is None:
+            # Varias sesiones de Streamlit pueden pedirlo a la vez
+            with self._lock:
+                if self._modulo is None:
+                    self._modulo = importlib.import_module(self._nombre)
+        return self._modulo
+
+    @property
+    def cargado(self):
+        return self._modulo is not None
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    def __repr__(self):
+        estado = "cargado" if self.cargado else "sin cargar"
+        return f"<módulo perezoso {self._nombre!r} ({estado})>"
@@ -0,0 +1,146 @@
+"""Regresión lineal simple a partir de estadísticos suficientes.
+
+La recta y = a + b·x de mínimos cuadrados sólo depende de n, Σx, Σy, Σxy y
+Σx² (Σy² para R²). Esos estadísticos se suman, así que:
+
+- los de varios grupos (años, regiones) salen en una pasada de np.bincount;
+- los de entrenamiento de cada pliegue son el total menos los del pliegue;
+- los de cada réplica bootstrap son sumas sobre índices remuestreados.
+
+Ajustes por grupo, validación cruzada y bootstrap son entonces operaciones
+vectorizadas de NumPy, sin sklearn ni statsmodels.
+"""
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+PLIEGUES = 5
+REPLICAS_BOOTSTRAP = 200
+SEMILLA = 42
+
+
+@dataclass
+class Estadisticos:
+    """Sumas suficientes por grupo; cada campo es un arreglo alineado por grupo."""
+    n: np.ndarray
+    sx: np.ndarray
+    sy: np.ndarray
+    sxy: np.ndarray
+    sxx: np.ndarray
+    syy: np.ndarray
+
+    @classmethod
+    def agrupados(cls, x, y, grupos, total):
+        """Estadísticos de los puntos (x, y) de cada grupo 0..total-1."""
+        def suma(pesos=None):
+            return np.bincount(grupos, weights=pesos, minlength=total)
+
+        return cls(n=suma(), sx=suma(x), sy=suma(y), sxy=suma(x * y), sxx=suma(x * x), syy=suma(y * y))
+
+    def __sub__(self, otro):
+        return Estadisticos(**{c: getattr(self, c) - getattr(otro, c) for c in self.__dataclass_fields__})
+
+    def centrados(self):
+        """(Sxx, Sxy, Syy): sumas de cuadrados y productos respecto a la media."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (
+                self.sxx - self.sx * self.sx / self.n,
+                self.sxy - self.sx * self.sy / self.n,
+                self.syy - self.sy * self.sy / self.n,
+            )
+
+    def coeficientes(self):
+        """(intercepto, pendiente); NaN donde x no varía o hay menos de dos puntos."""
+        sxx, sxy, _ = self.centrados()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pendiente = np.where((self.n >= 2) & (sxx > 0), sxy / sxx, np.nan)
+            intercepto = (self.sy - pendiente * self.sx) / self.n
+        return intercepto, pendiente
+
+    def r2(self):
+        sxx, sxy, syy = self.centrados()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where((sxx > 0) & (syy > 0), sxy * sxy / (sxx * syy), np.nan)
+
+
+def _pliegues(grupos, tamanios, k, rng):
+    """Pliegue 0..k-1 de cada punto, repartido al azar dentro de su grupo."""
+    orden = rng.permutation(len(grupos))
+    orden = orden[np.argsort(grupos[orden], kind="stable")]
+    inicio = np.cumsum(tamanios) - tamanios
+    rango = np.empty(len(grupos), dtype=np.int64)
+    rango[orden] = np.arange(len(grupos)) - inicio[grupos[orden]]
+    return rango % k
+
+
+def _bootstrap(x, y, grupos, tamanios, replicas, rng):
+    """Pendiente de cada réplica (replicas × grupos), remuestreando dentro de cada grupo."""
+    total = len(tamanios)
+    orden = np.argsort(grupos, kind="stable")
+    inicio = np.cumsum(tamanios) - tamanios
+    grupo_ordenado = grupos[orden]
+    # Para cada réplica y posición, un punto al azar del mismo grupo
+    desplazamiento = (rng.random((replicas, len(x))) * tamanios[grupo_ordenado]).astype(np.int64)
+    muestra = orden[inicio[grupo_ordenado] + desplazamiento]
+    clave = (np.arange(replicas)[:, None] * total + grupo_ordenado).ravel()
+    estadisticos = Estadisticos.agrupados(
+        x[muestra].ravel(), y[muestra].ravel(), clave, replicas * total
+    )
+    return estadisticos.coeficientes()[1].reshape(replicas, total)
+
+
+def ajustar(x, y, grupos=None, pliegues=PLIEGUES, replicas=REPLICAS_BOOTSTRAP, semilla=SEMILLA):
+    """Recta de y contra x para cada grupo, con métricas fuera de muestra.
+
+    `grupos` son códigos 0..G-1 (None = un solo grupo). Regresa un DataFrame
+    con una fila por grupo: n, intercepto, pendiente, r2 (en muestra), r2_cv
+    y mse_cv (validación cruzada de `pliegues` pliegues) y el intervalo
+    bootstrap del 95 % de la pendiente (pendiente_inf, pendiente_sup).
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    grupos = np.zeros(len(x), dtype=np.int64) if grupos is None else np.asarray(grupos, dtype=np.int64)
+    total = int(grupos.max()) + 1 if len(grupos) else 1
+    rng = np.random.default_rng(semilla)
+
+    # Se centran los datos para que las sumas de cuadrados no pierdan precisión
+    x0, y0 = (x.mean(), y.mean()) if len(x) else (0.0, 0.0)
+    xc, yc = x - x0, y - y0
+
+    estadisticos = Estadisticos.agrupados(xc, yc, grupos, total)
+    intercepto, pendiente = estadisticos.coeficientes()
+    tamanios = estadisticos.n.astype(np.int64)
+
+    # Validación cruzada: estadísticos por (grupo, pliegue) y entrenamiento = total - pliegue
+    pliegue = _pliegues(grupos, tamanios, pliegues, rng)
+    por_pliegue = Estadisticos.agrupados(xc, yc, grupos * pliegues + pliegue, total * pliegues)
+    entrenamiento = Estadisticos(**{
+        c: np.repeat(getattr(estadisticos, c), pliegues) - getattr(por_pliegue, c)
+        for c in estadisticos.__dataclass_fields__
+    })
+    a_cv, b_cv = entrenamiento.coeficientes()
+    celda = grupos * pliegues + pliegue
+    error = yc - (a_cv[celda] + b_cv[celda] * xc)
+    sse = np.bincount(grupos, weights=error * error, minlength=total)
+    syy = estadisticos.centrados()[2]
+
+    pendientes = _bootstrap(xc, yc, grupos, tamanios, replicas, rng)
+    with warnings.catch_warnings():
+        # Grupos sin pendiente definida en ninguna réplica
+        warnings.simplefilter("ignore", RuntimeWarning)
+        inferior, superior = np.nanpercentile(pendientes, [2.5, 97.5], axis=0)
+        mse = sse / estadisticos.n
+        r2_cv = 1 - sse / syy
+
+    return pd.DataFrame({
+        "n": tamanios,
+        "intercepto": intercepto + y0 - pendiente * x0,
+        "pendiente": pendiente,
+        "r2": estadisticos.r2(),
+        "r2_cv": r2_cv,
+        "mse_cv": mse,
+        "pendiente_inf": inferior,
+        "pendiente_sup": superior,
+    })
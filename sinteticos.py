@@ -0,0 +1,375 @@
+"""Datos sintéticos con la forma de la ENIGH para pruebas de rendimiento.
+
+Genera los archivos unificados (gastosUnificados, ingresosUnificados) con el
+esquema que lee el dashboard, de 100 mil a decenas de millones de filas, y
+los archivos crudos por año que consume el ETL. Las filas se producen por
+bloques con NumPy, así que la memoria depende del tamaño del bloque y no del
+total de filas.
+
+Uso:
+    python sinteticos.py --filas 1000000 --salida ./sinteticos
+    python sinteticos.py --filas 1000000 --salida ./crudos --crudos
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import exportar_parquet
+from etl import ANIOS, CONJUNTOS, FORMA_PAG, LUGAR_COMP, MESES, TAMANIO_BLOQUE, _eliminar
+
+# (claveEntidad, nombre, región, latitud, longitud, población)
+ENTIDADES = [
+    (1, "Aguascalientes", "Centro Norte", 21.88, -102.29, 1_425_607),
+    (2, "Baja California", "Noroeste", 30.84, -115.28, 3_769_020),
+    (3, "Baja California Sur", "Noroeste", 26.04, -111.67, 798_447),
+    (4, "Campeche", "Sureste", 19.83, -90.53, 928_363),
+    (5, "Coahuila", "Noreste", 27.06, -101.71, 3_146_771),
+    (6, "Colima", "Occidente", 19.25, -103.72, 731_391),
+    (7, "Chiapas", "Suroeste", 16.76, -93.13, 5_543_828),
+    (8, "Chihuahua", "Noroeste", 28.63, -106.07, 3_741_869),
+    (9, "Ciudad de México", "Centro", 19.43, -99.13, 9_209_944),
+    (10, "Durango", "Centro Norte", 24.03, -104.65, 1_832_650),
+    (11, "Guanajuato", "Centro Norte", 21.02, -101.26, 6_166_934),
+    (12, "Guerrero", "Suroeste", 17.44, -99.55, 3_540_685),
+    (13, "Hidalgo", "Centro", 20.09, -98.76, 3_082_841),
+    (14, "Jalisco", "Occidente", 20.66, -103.35, 8_348_151),
+    (15, "México", "Centro", 19.29, -99.66, 16_992_418),
+    (16, "Michoacán", "Occidente", 19.57, -101.71, 4_748_846),
+    (17, "Morelos", "Centro", 18.68, -99.10, 1_971_520),
+    (18, "Nayarit", "Occidente", 21.75, -104.85, 1_235_456),
+    (19, "Nuevo León", "Noreste", 25.59, -99.99, 5_784_442),
+    (20, "Oaxaca", "Suroeste", 17.07, -96.73, 4_132_148),
+    (21, "Puebla", "Centro", 19.04, -98.21, 6_583_278),
+    (22, "Querétaro", "Centro Norte", 20.59, -100.39, 2_368_467),
+    (23, "Quintana Roo", "Sureste", 19.18, -88.48, 1_857_985),
+    (24, "San Luis Potosí", "Centro Norte", 22.16, -100.99, 2_822_255),
+    (25, "Sinaloa", "Noroeste", 25.17, -107.48, 3_026_943),
+    (26, "Sonora", "Noroeste", 29.30, -110.33, 2_944_840),
+    (27, "Tabasco", "Sureste", 17.84, -92.62, 2_402_598),
+    (28, "Tamaulipas", "Noreste", 24.27, -98.84, 3_527_735),
+    (29, "Tlaxcala", "Centro", 19.32, -98.24, 1_342_977),
+    (30, "Veracruz", "Sureste", 19.17, -96.13, 8_062_579),
+    (31, "Yucatán", "Sureste", 20.71, -89.09, 2_320_898),
+    (32, "Zacatecas", "Centro Norte", 22.77, -102.58, 1_622_138),
+]
+
+CATEGORIAS_GASTO = [
+    "Alimentos, bebidas y tabaco", "Vestido y calzado", "Vivienda y servicios",
+    "Artículos y servicios para el hogar", "Cuidados de la salud", "Transporte",
+    "Educación y esparcimiento", "Cuidados personales", "Transferencias de gasto",
+]
+DESCRIPCIONES_POR_CATEGORIA = 12
+
+DESCRIPCIONES_INGRESO = [
+    "Sueldos, salarios o jornal", "Horas extras", "Comisiones y propinas",
+    "Aguinaldo", "Negocios propios", "Jubilaciones y pensiones", "Becas",
+    "Remesas", "Programas sociales", "Alquiler de inmuebles",
+    "Rendimientos financieros", "Otros ingresos",
+]
+
+# Columnas de los archivos crudos de gastos por año
+COLUMNAS_CRUDAS_GASTOS = [
+    "folioviv", "foliohog", "clave", "tipo_gasto", "mes_dia", "forma_pag1",
+    "forma_pag2", "forma_pag3", "lugar_comp", "orga_inst", "frecuencia",
+    "fecha_adqu", "fecha_pago", "cantidad", "gasto", "pago_mp", "costo",
+    "inmujer", "inst_1", "inst_2", "num_meses", "num_pagos", "ultim_pago",
+    "gasto_tri", "gasto_nm", "gas_nm_tri", "imujer_tri",
+]
+
+# Proporción de montos en blanco, como en los archivos de la ENIGH
+PROPORCION_BLANCOS = 0.02
+
+# Primer año cuyos archivos crudos traen el diseño muestral (factor, upm, est_dis)
+ANIO_DISENIO = 2022
+
+
+def claves_gasto():
+    return [f"G{i:03d}" for i in range(len(CATEGORIAS_GASTO) * DESCRIPCIONES_POR_CATEGORIA)]
+
+
+def claves_ingreso():
+    return [f"P{i:03d}" for i in range(1, len(DESCRIPCIONES_INGRESO) + 1)]
+
+
+def catalogo_gastos():
+    """categorias.csv: clave -> categoria, descripcion."""
+    claves = claves_gasto()
+    return pd.DataFrame({
+        "clave": claves,
+        "categoria": [CATEGORIAS_GASTO[i // DESCRIPCIONES_POR_CATEGORIA] for i in range(len(claves))],
+        "descripcion": [
+            f"{CATEGORIAS_GASTO[i // DESCRIPCIONES_POR_CATEGORIA]} {i % DESCRIPCIONES_POR_CATEGORIA + 1}"
+            for i in range(len(claves))
+        ],
+    })
+
+
+def catalogo_ingresos():
+    """ingresos_categorias.csv: clave -> descripcion."""
+    return pd.DataFrame({"clave": claves_ingreso(), "descripcion": DESCRIPCIONES_INGRESO})
+
+
+def poblacion():
+    """dataPoblacion.xlsx: una fila por entidad."""
+    return pd.DataFrame({
+        "claveEntidad": [e[0] for e in ENTIDADES],
+        "nombreEntidad": [e[1] for e in ENTIDADES],
+        "nombreEntidad2": [e[1] for e in ENTIDADES],
+        "region": [e[2] for e in ENTIDADES],
+        "poblacion": [e[5] for e in ENTIDADES],
+    })
+
+
+def coordenadas():
+    """Contenido de mexico.json: [{label, lat, lng}, ...]."""
+    return [{"label": e[1], "lat": e[3], "lng": e[4]} for e in ENTIDADES]
+
+
+def _entidades(rng, n):
+    """Claves de entidad (1..32) con probabilidad proporcional a la población."""
+    pesos = np.array([e[5] for e in ENTIDADES], dtype="float64")
+    return rng.choice(np.arange(1, len(ENTIDADES) + 1), size=n, p=pesos / pesos.sum())
+
+
+def _folios(rng, clave):
+    return clave.astype("int64") * 10**8 + rng.integers(0, 10**8, clave.size)
+
+
+def _montos(rng, n, escala):
+    """Montos log-normales (muchos pequeños, pocos grandes), redondeados a centavos."""
+    return np.round(rng.lognormal(np.log(escala), 1.0, n), 2)
+
+
+def _dimensiones_entidad(clave):
+    indice = clave - 1
+    nombres = pd.Categorical.from_codes(indice, [e[1] for e in ENTIDADES])
+    regiones_ = sorted({e[2] for e in ENTIDADES})
+    region = pd.Categorical.from_codes(
+        np.array([regiones_.index(e[2]) for e in ENTIDADES])[indice], regiones_
+    )
+    return nombres, region
+
+
+def bloque_gastos(rng, n, anios=ANIOS):
+    """`n` filas de gastosUnificados con el esquema del ETL."""
+    clave = _entidades(rng, n)
+    nombres, region = _dimensiones_entidad(clave)
+    catalogo = catalogo_gastos()
+    articulo = rng.integers(0, len(catalogo), n)
+    df = pd.DataFrame({
+        "folioviv": _folios(rng, clave),
+        "clave": catalogo["clave"].to_numpy()[articulo],
+        "forma_pag1": pd.Categorical.from_codes(rng.integers(0, len(FORMA_PAG), n), FORMA_PAG),
+        "lugar_comp": pd.Categorical.from_codes(rng.integers(0, len(LUGAR_COMP), n), LUGAR_COMP),
+        "cantidad": np.round(rng.random(n) * 5, 3),
+        "gasto": _montos(rng, n, 150),
+        "gasto_tri": _montos(rng, n, 450),
+        "anio": rng.choice(anios, n).astype("int16"),
+        "claveEntidad": clave.astype("int8"),
+        "nombreEntidad2": nombres,
+        "region": region,
+        "categoria": pd.Categorical.from_codes(articulo // DESCRIPCIONES_POR_CATEGORIA, CATEGORIAS_GASTO),
+        "descripcion": pd.Categorical.from_codes(articulo, catalogo["descripcion"]),
+    })
+    return df.assign(**_disenio(rng, df["anio"].to_numpy(), clave))
+
+
+def bloque_ingresos(rng, n, anios=ANIOS):
+    """`n` filas de ingresosUnificados con el esquema del ETL."""
+    clave = _entidades(rng, n)
+    nombres, region = _dimensiones_entidad(clave)
+    descripcion = rng.integers(0, len(DESCRIPCIONES_INGRESO), n)
+    anio = rng.choice(anios, n).astype("int16")
+    df = pd.DataFrame({
+        "folioviv": _folios(rng, clave),
+        "numren": rng.integers(1, 6, n).astype("int8"),
+        "clave": np.array(claves_ingreso())[descripcion],
+    })
+    # El periodo de referencia son los seis meses previos a la entrevista;
+    # mes_1 es el más reciente
+    ultimo = rng.integers(7, 13, n)
+    for i in range(1, 7):
+        df[f"mes_{i}"] = pd.Categorical.from_codes(ultimo - (i - 1), MESES)
+    mensuales = [_montos(rng, n, 1500) for _ in range(6)]
+    for i, monto in enumerate(mensuales, start=1):
+        df[f"ing_{i}"] = monto
+    df["ing_tri"] = np.round(sum(mensuales[:3]), 2)
+    df["anio"] = anio
+    df["claveEntidad"] = clave.astype("int8")
+    df["nombreEntidad2"] = nombres
+    df["region"] = region
+    df["descripcion"] = pd.Categorical.from_codes(descripcion, DESCRIPCIONES_INGRESO)
+    return df.assign(**_disenio(rng, anio, clave))
+
+
+def _disenio(rng, anio, clave):
+    """factor, upm y est_dis como quedan en los unificados: nulos antes de ANIO_DISENIO."""
+    disenio = pd.DataFrame(index=range(clave.size))
+    _agregar_disenio(rng, disenio, clave)
+    sin_disenio = anio < ANIO_DISENIO
+    return {
+        "factor": disenio["factor"].astype("float32").mask(sin_disenio),
+        "upm": disenio["upm"].astype("Int64").mask(sin_disenio),
+        "est_dis": disenio["est_dis"].astype("Int64").mask(sin_disenio),
+    }
+
+
+def bloques(generar, filas, semilla=0, tamanio_bloque=TAMANIO_BLOQUE, anios=ANIOS):
+    """Genera `filas` filas en bloques reproducibles de `tamanio_bloque`."""
+    rng = np.random.default_rng(semilla)
+    for inicio in range(0, filas, tamanio_bloque):
+        yield generar(rng, min(tamanio_bloque, filas - inicio), anios)
+
+
+def generar_gastos(filas, semilla=0, anios=ANIOS):
+    """DataFrame completo de gastos (para tamaños que caben en memoria)."""
+    return pd.concat(list(bloques(bloque_gastos, filas, semilla, anios=anios)), ignore_index=True)
+
+
+def generar_ingresos(filas, semilla=0, anios=ANIOS):
+    """DataFrame completo de ingresos (para tamaños que caben en memoria)."""
+    return pd.concat(list(bloques(bloque_ingresos, filas, semilla, anios=anios)), ignore_index=True)
+
+
+def _escribir(ruta, medida, partes, csv):
+    _eliminar(ruta)
+    filas = 0
+    for i, bloque in enumerate(partes):
+        if csv:
+            bloque.to_csv(ruta, mode="a", header=i == 0, index=False, encoding="utf-8")
+        exportar_parquet(bloque, ruta, medida, anexar=i > 0, bloque=i)
+        filas += len(bloque)
+    return filas
+
+
+def escribir_unificados(directorio, filas_gastos, filas_ingresos=None, semilla=0,
+                        tamanio_bloque=TAMANIO_BLOQUE, csv=True):
+    """Escribe los archivos unificados sintéticos, mexico.json y dataPoblacion.xlsx en `directorio`.
+
+    Siempre se escribe el dataset Parquet; el CSV solo con `csv` (a partir de
+    algunos millones de filas ocupa varios GB). Por defecto hay la mitad de
+    filas de ingresos que de gastos. Regresa {archivo: filas}.
+    """
+    if filas_ingresos is None:
+        filas_ingresos = filas_gastos // 2
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, "mexico.json"), "w", encoding="utf-8") as f:
+        json.dump(coordenadas(), f, ensure_ascii=False)
+    poblacion().to_excel(os.path.join(directorio, "dataPoblacion.xlsx"), index=False)
+    return {
+        "gastosUnificados.csv": _escribir(
+            os.path.join(directorio, "gastosUnificados.csv"), "gasto_tri",
+            bloques(bloque_gastos, filas_gastos, semilla, tamanio_bloque), csv,
+        ),
+        "ingresosUnificados.csv": _escribir(
+            os.path.join(directorio, "ingresosUnificados.csv"), "ing_tri",
+            bloques(bloque_ingresos, filas_ingresos, semilla + 1, tamanio_bloque), csv,
+        ),
+    }
+
+
+def _con_blancos(rng, valores):
+    """Texto de `valores` con una fracción de celdas en blanco."""
+    texto = valores.astype(str)
+    return np.where(rng.random(valores.size) < PROPORCION_BLANCOS, " ", texto)
+
+
+def crudo_gastos(rng, n, anio):
+    clave = _entidades(rng, n)
+    df = pd.DataFrame({c: rng.integers(0, 5, n) for c in COLUMNAS_CRUDAS_GASTOS})
+    df["folioviv"] = _folios(rng, clave)
+    # Algunas claves no están en el catálogo y el ETL las descarta al unir
+    df["clave"] = rng.choice(claves_gasto() + ["Z999"], n)
+    df["forma_pag1"] = _con_blancos(rng, rng.integers(0, len(FORMA_PAG), n))
+    df["lugar_comp"] = rng.integers(0, len(LUGAR_COMP), n)
+    df["cantidad"] = _con_blancos(rng, np.round(rng.random(n) * 5, 3))
+    df["gasto"] = _montos(rng, n, 150)
+    df["gasto_tri"] = _con_blancos(rng, _montos(rng, n, 450))
+    if anio >= ANIO_DISENIO:
+        _agregar_disenio(rng, df, clave)
+    return df
+
+
+def crudo_ingresos(rng, n, anio):
+    clave = _entidades(rng, n)
+    df = pd.DataFrame({
+        "folioviv": _folios(rng, clave),
+        "foliohog": 1,
+        "numren": rng.integers(1, 6, n),
+        "clave": rng.choice(claves_ingreso(), n),
+    })
+    ultimo = rng.integers(7, 13, n)
+    for i in range(1, 7):
+        df[f"mes_{i}"] = _con_blancos(rng, ultimo - (i - 1))
+    for i in range(1, 7):
+        df[f"ing_{i}"] = _con_blancos(rng, _montos(rng, n, 1500))
+    df["ing_tri"] = _montos(rng, n, 4500)
+    if anio >= ANIO_DISENIO:
+        _agregar_disenio(rng, df, clave)
+    return df
+
+
+def _agregar_disenio(rng, df, clave):
+    df["entidad"] = clave
+    df["est_dis"] = clave * 10 + rng.integers(1, 10, clave.size)
+    df["upm"] = df["est_dis"] * 1000 + rng.integers(1, 500, clave.size)
+    df["factor"] = rng.integers(50, 800, clave.size)
+
+
+def escribir_crudos(directorio, filas, semilla=0, anios=ANIOS, tamanio_bloque=TAMANIO_BLOQUE):
+    """Escribe los CSV crudos por año y los catálogos que lee el ETL.
+
+    `filas` son las filas de gastos de cada año; ingresos lleva la mitad.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    poblacion().to_excel(os.path.join(directorio, "dataPoblacion.xlsx"), index=False)
+    catalogo_gastos().to_csv(
+        os.path.join(directorio, CONJUNTOS["gastos"].categorias), index=False
+    )
+    catalogo_ingresos().to_csv(
+        os.path.join(directorio, CONJUNTOS["ingresos"].categorias), index=False,
+        encoding=CONJUNTOS["ingresos"].codificacion_categorias,
+    )
+    for anio in anios:
+        for nombre, generar, total in [
+            ("gastos", crudo_gastos, filas),
+            ("ingresos", crudo_ingresos, filas // 2),
+        ]:
+            ruta = os.path.join(directorio, f"{nombre}{anio}.csv")
+            _eliminar(ruta)
+            for inicio in range(0, total, tamanio_bloque):
+                bloque = generar(rng, min(tamanio_bloque, total - inicio), anio)
+                bloque.to_csv(ruta, mode="a", header=inicio == 0, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Datos sintéticos con la forma de la ENIGH")
+    parser.add_argument("--filas", type=int, default=1_000_000,
+                        help="filas de gastos (ingresos lleva la mitad)")
+    parser.add_argument("--salida", default="sinteticos")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--tamanio-bloque", type=int, default=TAMANIO_BLOQUE)
+    parser.add_argument("--sin-csv", action="store_true",
+                        help="escribe solo los datasets Parquet")
+    parser.add_argument("--crudos", action="store_true",
+                        help="escribe los CSV crudos por año del ETL (--filas por año)")
+    args = parser.parse_args(argv)
+
+    if args.crudos:
+        escribir_crudos(args.salida, args.filas, args.semilla, tamanio_bloque=args.tamanio_bloque)
+        print(f"Archivos crudos escritos en {args.salida}")
+        return
+    filas = escribir_unificados(
+        args.salida, args.filas, semilla=args.semilla,
+        tamanio_bloque=args.tamanio_bloque, csv=not args.sin_csv,
+    )
+    for archivo, total in filas.items():
+        print(f"{archivo}: {total} filas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Instrumentación del dashboard: tramos de tiempo agrupados en trazas.
+
+Una traza cubre un rerun (o el rerun de un fragmento) y se compone de tramos
+anidados: carga de datos, cada consulta a los cubos, cada figura y cada
+sección. Cada tramo guarda su duración, la memoria residente antes y después
+y atributos como el número de filas que produjo.
+
+    trazas.configurar("trazas.jsonl")
+    with trazas.traza("rerun"):
+        with trazas.tramo("consultar", cubo="gastos") as t:
+            resultado = ...
+            t.registrar(filas=len(resultado))
+
+Fuera de una traza `tramo` no mide nada y su costo es despreciable. Las
+trazas terminadas se pueden exportar como JSON con la forma de OTLP
+(``resourceSpans`` / ``scopeSpans`` / ``spans``), una por línea.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+SERVICIO = "dashboard-enigh"
+
+_traza_actual = contextvars.ContextVar("traza_actual", default=None)
+_lock_archivo = threading.Lock()
+# Archivo al que se exportan las trazas terminadas (None = no se exportan)
+_archivo = None
+
+
+def configurar(archivo=None):
+    """Exporta a `archivo` (JSON por líneas) cada traza que termine; None lo desactiva."""
+    global _archivo
+    _archivo = archivo
+
+
+def memoria_residente():
+    """Memoria residente actual del proceso en bytes (None si no se puede leer)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _id(bytes_):
+    return os.urandom(bytes_).hex()
+
+
+@dataclass
+class Tramo:
+    nombre: str
+    id: str
+    padre: str = None
+    nivel: int = 0
+    inicio_ns: int = 0
+    fin_ns: int = 0
+    atributos: dict = field(default_factory=dict)
+
+    @property
+    def duracion_s(self):
+        return (self.fin_ns - self.inicio_ns) / 1e9
+
+    def registrar(self, **atributos):
+        self.atributos.update(atributos)
+
+
+class _TramoNulo:
+    """Tramo que se entrega fuera de una traza; descarta todo."""
+
+    def registrar(self, **atributos):
+        pass
+
+
+TRAMO_NULO = _TramoNulo()
+
+
+@dataclass
+class Traza:
+    nombre: str
+    id: str = field(default_factory=lambda: _id(16))
+    tramos: list = field(default_factory=list)
+    pila: list = field(default_factory=list, repr=False)
+
+    def resumen(self):
+        """Filas (tramo con sangría por nivel, ms, filas, memoria en MB) en orden de inicio."""
+        return [
+            {
+                "tramo": "│ " * t.nivel + t.nombre + (f" · {t.atributos['etiqueta']}" if "etiqueta" in t.atributos else ""),
+                "ms": round(t.duracion_s * 1000, 2),
+                "filas": t.atributos.get("filas"),
+                "memoria_mb": (
+                    round(t.atributos["memoria_delta_bytes"] / 2**20, 2)
+                    if t.atributos.get("memoria_delta_bytes") is not None else None
+                ),
+            }
+            for t in sorted(self.tramos, key=lambda t: t.inicio_ns)
+        ]
+
+    def a_otlp(self):
+        """La traza como un documento JSON al estilo de OTLP."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_atributo("service.name", SERVICIO)]},
+                "scopeSpans": [{
+                    "scope": {"name": "trazas"},
+                    "spans": [
+                        {
+                            "traceId": self.id,
+                            "spanId": t.id,
+                            "parentSpanId": t.padre or "",
+                            "name": t.nombre,
+                            "startTimeUnixNano": str(t.inicio_ns),
+                            "endTimeUnixNano": str(t.fin_ns),
+                            "attributes": [_atributo(k, v) for k, v in t.atributos.items() if v is not None],
+                        }
+                        for t in self.tramos
+                    ],
+                }],
+            }]
+        }
+
+
+def _atributo(clave, valor):
+    if isinstance(valor, bool):
+        tipo = {"boolValue": valor}
+    elif isinstance(valor, int):
+        tipo = {"intValue": str(valor)}
+    elif isinstance(valor, float):
+        tipo = {"doubleValue": valor}
+    else:
+        tipo = {"stringValue": str(valor)}
+    return {"key": clave, "value": tipo}
+
+
+def traza_actual():
+    return _traza_actual.get()
+
+
+@contextmanager
+def tramo(nombre, **atributos):
+    """Mide el bloque como un tramo de la traza actual (no hace nada sin traza)."""
+    actual = _traza_actual.get()
+    if actual is None:
+        yield TRAMO_NULO
+        return
+
+    padre = actual.pila[-1] if actual.pila else None
+    nuevo = Tramo(
+        nombre=nombre,
+        id=_id(8),
+        padre=padre.id if padre else None,
+        nivel=len(actual.pila),
+        atributos=dict(atributos),
+    )
+    memoria = memoria_residente()
+    actual.pila.append(nuevo)
+    nuevo.inicio_ns = time.time_ns()
+    try:
+        yield nuevo
+    except BaseException as error:
+        nuevo.registrar(error=type(error).__name__)
+        raise
+    finally:
+        nuevo.fin_ns = time.time_ns()
+        actual.pila.pop()
+        if memoria is not None:
+            nuevo.atributos["memoria_delta_bytes"] = memoria_residente() - memoria
+        actual.tramos.append(nuevo)
+
+
+def iniciar(nombre):
+    """Empieza una traza en el contexto actual, reemplazando cualquier otra abierta."""
+    nueva = Traza(nombre)
+    _traza_actual.set(nueva)
+    return nueva
+
+
+def terminar(actual):
+    """Cierra `actual` y la exporta si hay un archivo configurado."""
+    if _traza_actual.get() is actual:
+        _traza_actual.set(None)
+    if _archivo:
+        exportar(actual, _archivo)
+    return actual
+
+
+@contextmanager
+def traza(nombre, **atributos):
+    """Bloque medido como traza propia o, dentro de otra traza, como un tramo más."""
+    if _traza_actual.get() is not None:
+        with tramo(nombre, **atributos):
+            yield _traza_actual.get()
+        return
+
+    nueva = iniciar(nombre)
+    try:
+        with tramo(nombre, **atributos):
+            yield nueva
+    finally:
+        terminar(nueva)
+
+
+def trazado(nombre, **atributos):
+    """Decorador: cada llamada es una traza propia o un tramo de la traza actual."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envuelta(*args, **kwargs):
+            with traza(nombre, **{"etiqueta": funcion.__name__, **atributos}):
+                return funcion(*args, **kwargs)
+        return envuelta
+    return decorador
+
+
+def exportar(actual, archivo):
+    linea = json.dumps(actual.a_otlp(), ensure_ascii=False)
+    with _lock_archivo:
+        with open(archivo, "a", encoding="utf-8") as f:
+            f.write(linea + "\n")